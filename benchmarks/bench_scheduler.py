@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Microbenchmark of devices update scheduling.
+
+Compares selection of the least recently updated devices by sorting of a plain dict
+(as it was done before) with DeviceScheduler heap.
+
+Usage: python3 benchmarks/bench_scheduler.py [DEVICES ...]
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from custom_components.narodmon.scheduler import DeviceScheduler  # noqa: E402
+
+LIMIT = 10
+ROUNDS = 200
+
+
+def bench(size: int) -> None:
+    """Run benchmark for given number of tracked devices."""
+    rnd = random.Random(size)
+    devices = {i: rnd.random() * 1000 for i in range(size)}
+    scheduler = DeviceScheduler()
+    for device_id, updated_ts in devices.items():
+        scheduler.push(device_id, updated_ts)
+
+    def poll_sorted():
+        selected = set(sorted(devices, key=lambda x: devices[x])[:LIMIT])
+        for device_id in selected:
+            devices[device_id] += 1000
+
+    def poll_heap():
+        for device_id in scheduler.due(0, LIMIT):
+            scheduler.push(device_id, scheduler[device_id] + 1000)
+
+    sort_us = timeit.timeit(poll_sorted, number=ROUNDS) / ROUNDS * 1e6
+    heap_us = timeit.timeit(poll_heap, number=ROUNDS) / ROUNDS * 1e6
+    print(  # noqa: T201
+        f"{size:>8} devices: sorted {sort_us:>10.1f} us/poll,"
+        f" heap {heap_us:>7.1f} us/poll, x{sort_us / heap_us:.1f}"
+    )
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:] or ["100", "1000", "10000", "50000"]:
+        bench(int(arg))
@@ -10,9 +10,11 @@ import asyncio
 from datetime import timedelta
 import logging
 import os
+import random
 import re
 import time
-from typing import Any, Dict, List
+from types import MappingProxyType
+from typing import Any, Dict, Final, List, Mapping, Optional, Tuple
 
 import voluptuous as vol
 
@@ -29,26 +31,35 @@ from homeassistant.const import (
     CONF_TIMEOUT,
     CONF_VERIFY_SSL,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import config_validation as cv, instance_id
 from homeassistant.helpers.storage import STORAGE_DIR
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .api import NARODMON_IDS, NarodmonApiClient
+from .api import NARODMON_IDS, NarodmonApiClient, SensorReading
 from .const import (
     CONF_APIKEY,
+    CONF_DEDICATED_SESSION,
+    CONF_HEDGE_REQUESTS,
+    CONF_RESTORE_TIME,
+    DEFAULT_DEDICATED_SESSION,
+    DEFAULT_HEDGE_REQUESTS,
+    DEFAULT_RESTORE_TIME,
     DEFAULT_SCAN_INTERVAL,
     DEFAULT_TIMEOUT,
     DEFAULT_VERIFY_SSL,
     DOMAIN,
     FRESHNESS_TIME,
+    POLL_JITTER,
     SENSOR_TYPES,
     STARTUP_MESSAGE,
 )
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
+NARODMON_SNAPSHOT: Final = Mapping[int, SensorReading]
+
 
 def cv_apikey(value: Any) -> str:
     """Validate and coerce a NarodMon API key value."""
@@ -66,6 +77,9 @@ DEVICE_SCHEMA = vol.Schema(
         vol.Optional(CONF_SCAN_INTERVAL, default=DEFAULT_SCAN_INTERVAL): vol.All(
             cv.time_period, lambda value: timedelta(seconds=value.total_seconds())
         ),
+        vol.Optional(CONF_RESTORE_TIME, default=DEFAULT_RESTORE_TIME): vol.All(
+            cv.time_period, lambda value: timedelta(seconds=value.total_seconds())
+        ),
     }
 )
 
@@ -74,6 +88,10 @@ CONFIG_SCHEMA_ROOT = vol.Schema(
         vol.Optional(CONF_APIKEY): cv_apikey,
         vol.Optional(CONF_VERIFY_SSL, default=DEFAULT_VERIFY_SSL): cv.boolean,
         vol.Optional(CONF_TIMEOUT, default=DEFAULT_TIMEOUT): cv.positive_int,
+        vol.Optional(
+            CONF_DEDICATED_SESSION, default=DEFAULT_DEDICATED_SESSION
+        ): cv.boolean,
+        vol.Optional(CONF_HEDGE_REQUESTS, default=DEFAULT_HEDGE_REQUESTS): cv.boolean,
         vol.Required(CONF_DEVICES): vol.All(cv.ensure_list, [DEVICE_SCHEMA]),
     }
 )
@@ -130,7 +148,11 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             hass,
             apikey=apikey,
             verify_ssl=config.get(CONF_VERIFY_SSL),
-            timeout=config.get(CONF_TIMEOUT),
+            timeout=config.get(CONF_TIMEOUT, DEFAULT_TIMEOUT),
+            dedicated_session=config.get(
+                CONF_DEDICATED_SESSION, DEFAULT_DEDICATED_SESSION
+            ),
+            hedge_requests=config.get(CONF_HEDGE_REQUESTS, DEFAULT_HEDGE_REQUESTS),
         )
 
         for index, device_config in enumerate(config.get(CONF_DEVICES)):
@@ -142,16 +164,22 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             coordinator = NarodmonDataUpdateCoordinator(
                 hass, client, scan_interval, latitude, longitude, types
             )
-            await coordinator.async_refresh()
-
-            if not coordinator.last_update_success:  # pragma: no cover
-                raise ConfigEntryNotReady
 
             hass.data[DOMAIN].setdefault(entry.entry_id, {})
             hass.data[DOMAIN][entry.entry_id][index] = coordinator
 
+        client.reserve_budget(len(config.get(CONF_DEVICES)))
+
         hass.async_add_job(hass.config_entries.async_forward_entry_setup(entry, SENSOR))
 
+        # Entities become available as soon as first data arrive
+        for index, coordinator in hass.data[DOMAIN].get(entry.entry_id, {}).items():
+            entry.async_create_background_task(
+                hass,
+                coordinator.async_refresh(),
+                f"{DOMAIN} {entry.entry_id} {index} first refresh",
+            )
+
     else:
         config = entry.data.copy()
 
@@ -167,7 +195,9 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         )
     )
     if unloaded:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinators = hass.data[DOMAIN].pop(entry.entry_id, {})
+        for client in {i.api for i in coordinators.values()}:
+            await client.async_close()
 
     return unloaded
 
@@ -193,6 +223,8 @@ class NarodmonDataUpdateCoordinator(DataUpdateCoordinator):
         """Initialize."""
         super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=scan_interval)
 
+        self.scan_interval = scan_interval
+        self._phase: Optional[float] = None
         self.api = client
         self.latitude = latitude
         self.longitude = longitude
@@ -201,43 +233,152 @@ class NarodmonDataUpdateCoordinator(DataUpdateCoordinator):
         self.sensors: NARODMON_IDS = set()
 
         self._first_run = True
-
-    async def _async_update_data(self):
-        """Update data via library."""
+        self._sensor_devices: Dict[int, int] = {}
+        self._sensor_types: Dict[int, int] = {}
+        self._watermarks: Dict[int, Tuple[int, int]] = {}
+        self._changed_types: Optional[NARODMON_IDS] = None
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update listeners of changed sensor types only.
+
+        All listeners are updated when availability of data may have changed.
+        """
+        if self._changed_types is None or not self.last_update_success:
+            super().async_update_listeners()
+            return
+
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or context in self._changed_types:
+                update_callback()
+
+    def _track_changes(
+        self, types: NARODMON_IDS, readings: Dict[int, SensorReading]
+    ) -> None:
+        """Find sensor types with readings changed since last update."""
+        watermarks = {i.type: (i.id, i.time) for i in readings.values()}
+        if not self.last_update_success or self.data is None:
+            self._changed_types = None
+        else:
+            # Types without readings are always updated to expire restored states
+            self._changed_types = {
+                i
+                for i in types
+                if i not in watermarks or watermarks[i] != self._watermarks.get(i)
+            }
+        self._watermarks = watermarks
+
+    def _add_sensors(self, new_sensors: Dict[int, int]) -> None:
+        """Use newly found sensors instead of known ones of the same types."""
+        for i in new_sensors:
+            if i in self.api.sensors:
+                self._sensor_types[i] = self.api.sensors[i].type
+        types = {self._sensor_types[i] for i in new_sensors if i in self._sensor_types}
+        for i in list(self._sensor_devices):
+            if i not in new_sensors and self._sensor_types.get(i) in types:
+                self._sensor_devices.pop(i)
+                self._sensor_types.pop(i)
+
+        self._sensor_devices.update(new_sensors)
+        self.sensors = set(self._sensor_devices)
+        self.devices = set(self._sensor_devices.values())
+        self.api.set_device_references(self, self.devices)
+
+    async def _async_nearby_listener(self, new_sensors: Dict[int, int]) -> None:
+        """Handle sensors found by nearby sensors search."""
+        self._add_sensors(new_sensors)
+
+    async def _async_schedule_phase(self) -> None:
+        """Shift next update to the polling phase of this Home Assistant instance.
+
+        Phase is derived from instance ID, so different installations poll API at
+        different times, while all coordinators of one installation stay in sync.
+        """
+        interval = self.scan_interval.total_seconds()
+        if self._phase is None:
+            uuid = await instance_id.async_get(self.hass)
+            self._phase = int(uuid.replace("-", "")[:8], 16) / 0x100000000 * interval
+
+        now = time.time()
+        delay = interval - (now - self._phase) % interval
+        if delay < interval / 2:
+            delay += interval
+        jitter = min(POLL_JITTER, interval / 10)
+        delay += random.uniform(-jitter, jitter)
+
+        self.update_interval = timedelta(seconds=delay)
+
+    def _missing_types(self, types: NARODMON_IDS, fresh: int) -> NARODMON_IDS:
+        """Return sensor types having no sensor with fresh or pending readings."""
+        covered: NARODMON_IDS = set()
+        for sensor_id in self.sensors:
+            reading = self.api.sensors.get(sensor_id)
+            if reading is not None:
+                if reading.time >= fresh:
+                    covered.add(reading.type)
+            elif sensor_id in self._sensor_types:
+                covered.add(self._sensor_types[sensor_id])
+            else:
+                return set()  # Wait for the first readings of sensor
+
+        return types - covered
+
+    def _failing_sensors(self, types: NARODMON_IDS) -> NARODMON_IDS:
+        """Return current sensors of given types, which are to be replaced."""
+        return {i for i in self.sensors if self._sensor_types.get(i) in types}
+
+    async def _async_update_data(self) -> NARODMON_SNAPSHOT:
+        """Update data via library.
+
+        Returns a read-only snapshot of fresh readings indexed by sensor type ID.
+        Sensors of missing types are searched within the same update.
+        """
         try:
-            fresh = int(time.time() - FRESHNESS_TIME)
-            sensors = []
-
-            for _ in range(2):
-                data = await self.api.async_update_data(no_throttle=self._first_run)
-
-                if data is None:
-                    raise UpdateFailed()
-
-                tps: NARODMON_IDS = {SENSOR_TYPES[i].get(ATTR_ID) for i in self.types}
-                for sensor in data.values():
-                    if sensor["id"] in self.sensors and sensor["time"] >= fresh:
-                        sensors.append(sensor)
-                        tps.remove(sensor["type"])
-
-                if tps:
-
-                    async def async_nearby_listener(
-                        new_sensors: Dict[int, int]
-                    ) -> None:  # pragma: no cover
-                        self.devices = self.devices.union(new_sensors.values())
-                        self.sensors = self.sensors.union(new_sensors.keys())
-
-                    await self.api.async_set_nearby_listener(
-                        async_nearby_listener, self.latitude, self.longitude, tps
-                    )
-
-                if not self._first_run or self.api.devices:
-                    break  # pragma: no cover
+            fresh = int(self.api.server_time() - FRESHNESS_TIME)
+            readings: Dict[int, SensorReading] = {}
+            types: NARODMON_IDS = {SENSOR_TYPES[i].get(ATTR_ID) for i in self.types}
+
+            if self._first_run and not self.sensors:
+                cached = await self.api.async_get_cached_nearby_sensors(
+                    self.latitude, self.longitude, types
+                )
+                self._add_sensors(cached)
+
+            if missing := self._missing_types(types, fresh):
+                await self.api.async_set_nearby_listener(
+                    self._async_nearby_listener,
+                    self.latitude,
+                    self.longitude,
+                    missing,
+                    exclude=self._failing_sensors(missing),
+                )
+
+            data = await self.api.async_update_data(force=self._first_run)
+
+            # Sensors set can be changed by nearby sensors search during update
+            for sensor in [data[i] for i in self.sensors if i in data]:
+                self._sensor_types.setdefault(sensor.id, sensor.type)
+                if sensor.time >= fresh:
+                    readings.setdefault(sensor.type, sensor)
+
+            self._track_changes(types, readings)
+
+            if tps := types - readings.keys() - missing:
+                await self.api.async_set_nearby_listener(
+                    self._async_nearby_listener,
+                    self.latitude,
+                    self.longitude,
+                    tps,
+                    exclude=self._failing_sensors(tps),
+                )
 
             self._first_run = False
 
-            return sensors
+            return MappingProxyType(readings)
 
         except Exception as exception:  # pylint: disable=broad-except
+            self._changed_types = None
             raise UpdateFailed() from exception
+
+        finally:
+            await self._async_schedule_phase()
@@ -7,31 +7,61 @@ For more details about this sensor, please refer to the documentation at
 https://github.com/Limych/ha-narodmon/
 """
 import asyncio
-from collections.abc import Awaitable, Callable
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass, field
 from datetime import timedelta
+from email.utils import parsedate_to_datetime
 from http import HTTPStatus
+import importlib.util
 import logging
 import socket
 import time
-from typing import Any, Dict, Final, Generic, List, Optional, Set, TypeVar, Union
+from typing import (
+    Any,
+    Dict,
+    Final,
+    FrozenSet,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import aiohttp
-import async_timeout
 
-from homeassistant.const import __short_version__ as HASS_VERSION
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    EVENT_HOMEASSISTANT_CLOSE,
+    __short_version__ as HASS_VERSION,
+)
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
 from homeassistant.helpers import instance_id, storage
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.util import Throttle
+from homeassistant.util import ssl as ssl_util
+from homeassistant.util.json import json_loads
 
+from .breaker import CircuitBreaker
+from .budget import (
+    PRIORITY_DISCOVERY,
+    PRIORITY_INIT,
+    PRIORITY_UPDATE,
+    RequestBudget,
+)
 from .const import (
     DEFAULT_TIMEOUT,
     DEFAULT_VERIFY_SSL,
     DOMAIN,
+    FRESHNESS_TIME,
     ISSUE_URL,
     KHASH,
     VERSION,
 )
+from .latency import LatencyTracker
+from .scheduler import DeviceScheduler
+from .spatial import StationIndex, distance
 
 _LOGGER: Final = logging.getLogger(__package__)
 
@@ -42,15 +72,81 @@ HEADERS: Final = {
     "User-Agent": f"ha-narodmon/{VERSION} (https://github.com/Limych/ha-narodmon/)",
     "Content-type": "application/json; charset=UTF-8",
 }
+# Brotli is decoded by aiohttp only when one of these packages is installed
+ACCEPT_ENCODING: Final = (
+    "gzip, br"
+    if any(importlib.util.find_spec(i) for i in ("brotlicffi", "brotli"))
+    else "gzip"
+)
+
+CONNECT_TIMEOUT: Final = 5  # seconds
+DNS_CACHE_TTL: Final = 3600  # seconds
+KEEPALIVE_TIMEOUT: Final = 300  # seconds
+CONNECTIONS_LIMIT: Final = 2
+
+UPDATE_MIN_INTERVAL: Final = timedelta(minutes=1)
+UPDATE_WAIT_TIMEOUT: Final = timedelta(minutes=1)
+
+POLL_INTERVAL_MIN: Final = timedelta(minutes=1)
+POLL_INTERVAL_MAX: Final = timedelta(minutes=30)
+POLL_GRACE_TIME: Final = 30  # seconds
+CADENCE_SMOOTHING: Final = 0.3
+
+REQUEST_COSTS: Final = {
+    "appInit": 1,
+    "sensorsOnDevice": 1,
+    "sensorsNearby": 2,
+}
+REQUEST_PRIORITIES: Final = {
+    "appInit": PRIORITY_INIT,
+    "sensorsOnDevice": PRIORITY_UPDATE,
+    "sensorsNearby": PRIORITY_DISCOVERY,
+}
+BUDGET_CAPACITY: Final = 3  # requests
+BUDGET_REFILL_TIME: Final = 60  # seconds per request
+BUDGET_DAILY_QUOTA: Final = 1000  # requests
+
+BREAKER_THRESHOLD: Final = 3  # failed requests
+BREAKER_BASE_DELAY: Final = 60  # seconds
+BREAKER_MAX_DELAY: Final = 3600  # seconds
+ERRNO_COOLDOWNS: Final = {
+    401: 3600,  # Invalid API key
+    403: 3600,  # Access denied
+    423: 3600,  # API key is blocked
+    429: 600,  # Too many requests
+}
+
+HEDGE_PERCENTILE: Final = 0.95
+HEDGE_MIN_DELAY: Final = 0.5  # seconds
+HEDGE_WINDOW: Final = 50  # requests
+HEDGE_MIN_SAMPLES: Final = 10  # requests
+
+CLOCK_SMOOTHING: Final = 0.2
+CLOCK_TOLERANCE: Final = 300  # seconds
+
+CACHE_MAX_DEVICES: Final = 100
+CACHE_TTL: Final = timedelta(hours=1)
 
 DATA_VERSION: Final = 1
+DATA_SAVE_DELAY: Final = 10  # seconds
 
 DATA_LAST_INIT_TS: Final = "last_init"
+DATA_LIMIT: Final = "limit"
+DATA_NEARBY: Final = "nearby"
+DATA_QUOTA: Final = "quota"
+DATA_UNAVAILABLE: Final = "unavailable"
+
+NEARBY_CACHE_TTL: Final = timedelta(days=1)
+NEARBY_CANDIDATES: Final = 3
+NEARBY_MERGE_DISTANCE: Final = 1.0  # km
+UNAVAILABLE_TTL_MIN: Final = timedelta(hours=1)
+UNAVAILABLE_TTL_MAX: Final = timedelta(days=7)
 
 NARODMON_IDS: Final = Set[int]
 NARODMON_NEARBY_LISTENER: Final = Callable[[Dict[int, int]], Awaitable[None]]
 NARODMON_SENSORS_LIST: Final = List[Dict[str, Any]]
-NARODMON_SENSORS_DICT: Final = Dict[int, Dict[str, Any]]
+NARODMON_SENSORS_DICT: Final = Dict[int, "SensorReading"]
+NARODMON_REQUEST: Final = Dict[str, Union[str, int, float]]
 
 
 class ApiError(Exception):
@@ -63,6 +159,100 @@ class ApiError(Exception):
         self.status = status
 
 
+@dataclass(slots=True)
+class DeviceInfo:
+    """Narodmon device information."""
+
+    id: int
+    name: str
+    distance: Optional[float] = None
+    location: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DeviceInfo":
+        """Create device information from API response data."""
+        return cls(
+            int(data["id"]),
+            data.get("name", ""),
+            data.get("distance"),
+            data.get("location"),
+            data.get("lat"),
+            data.get("lon"),
+        )
+
+
+@dataclass(slots=True)
+class SensorReading:
+    """Narodmon sensor reading."""
+
+    id: int
+    type: int
+    value: Any
+    time: int
+    name: str
+    device: DeviceInfo
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], device: DeviceInfo) -> "SensorReading":
+        """Create sensor reading from API response data."""
+        return cls(
+            int(data["id"]),
+            data["type"],
+            data.get("value"),
+            data.get("time", 0),
+            data.get("name", ""),
+            device,
+        )
+
+
+@dataclass(slots=True)
+class NearbyRequest:
+    """Pending search request for nearby sensors."""
+
+    latitude: float
+    longitude: float
+    sensor_types: NARODMON_IDS = field(default_factory=set)
+    listeners: List[Tuple[NARODMON_NEARBY_LISTENER, NARODMON_IDS]] = field(
+        default_factory=list
+    )
+    exclude: NARODMON_IDS = field(default_factory=set)
+
+    def add_listener(
+        self,
+        target: NARODMON_NEARBY_LISTENER,
+        sensor_types: NARODMON_IDS,
+        exclude: Iterable[int] = (),
+    ) -> None:
+        """Add listener for sensors of given types or update types of existing one.
+
+        Sensors from `exclude` are never offered, e.g. failing ones to be replaced.
+        """
+        self.listeners = [i for i in self.listeners if i[0] != target]
+        self.listeners.append((target, set(sensor_types)))
+        self.sensor_types.update(sensor_types)
+        self.exclude.update(exclude)
+
+    def merge(self, other: "NearbyRequest") -> None:
+        """Merge listeners of other request for its still unresolved sensor types."""
+        for target, types in other.listeners:
+            if types := types & other.sensor_types:
+                for listener, known in self.listeners:
+                    if listener == target:
+                        types |= known
+                self.add_listener(target, types, other.exclude)
+
+
+class CacheInfo(NamedTuple):
+    """Sensors cache statistics."""
+
+    devices: int
+    sensors: int
+    evicted_devices: int
+    evicted_sensors: int
+
+
 class NarodmonApiClient(Generic[T]):
     """Narodmon API client class."""
 
@@ -72,38 +262,262 @@ class NarodmonApiClient(Generic[T]):
         apikey: str = None,
         verify_ssl: bool = DEFAULT_VERIFY_SSL,
         timeout: int = DEFAULT_TIMEOUT,
+        dedicated_session: bool = False,
+        hedge_requests: bool = False,
     ) -> None:
         """Initialize coordinator."""
         self.hass = hass
         self.sensors: NARODMON_SENSORS_DICT = {}
 
         self._apikey = apikey or self._khash
-        self._session = async_get_clientsession(hass, verify_ssl=verify_ssl)
-        self._timeout = timeout
-        self._devices: Dict[int, float] = {}
+        self._own_session = dedicated_session
+        self._session = (
+            self._create_session(verify_ssl)
+            if dedicated_session
+            else async_get_clientsession(hass, verify_ssl=verify_ssl)
+        )
+        self._unsub_close: Optional[CALLBACK_TYPE] = None
+        if dedicated_session:
+            # Entries are not unloaded on shutdown, so close session with HA
+            self._unsub_close = hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_CLOSE, self._async_handle_close
+            )
+        self._hedge_requests = hedge_requests
+        self._latency = LatencyTracker(HEDGE_WINDOW, HEDGE_MIN_SAMPLES)
+        self._clock_offset: Optional[float] = None
+        self._breaker = CircuitBreaker(
+            BREAKER_THRESHOLD, BREAKER_BASE_DELAY, BREAKER_MAX_DELAY
+        )
+        self._timeout = aiohttp.ClientTimeout(
+            total=CONNECT_TIMEOUT + timeout,
+            connect=CONNECT_TIMEOUT,
+            sock_read=timeout,
+        )
+        self._devices = DeviceScheduler()
+        self._publish_ts: Dict[int, int] = {}
+        self._cadence: Dict[int, float] = {}
+        self._poll_misses: Dict[int, int] = {}
+        self._device_refs: Dict[object, FrozenSet[int]] = {}
+        self._stations = StationIndex()
+        self._evicted_devices = 0
+        self._evicted_sensors = 0
         self._sensors_last_updated = False
-        self._nearby_listener: Optional[NARODMON_NEARBY_LISTENER] = None
-        self._nearby_latitude: Optional[float] = None
-        self._nearby_longitude: Optional[float] = None
-        self._nearby_sensor_types: NARODMON_IDS = set()
+        self._nearby_requests: Dict[str, NearbyRequest] = {}
         self._limit: int = 1
+        self._update_task: Optional[asyncio.Task] = None
+        self._update_ts: float = 0
+        self._inflight: List[Tuple[Tuple, FrozenSet[int], asyncio.Task]] = []
+        self._store = storage.Store(hass, DATA_VERSION, DOMAIN, True)
+        self._data: Optional[Dict[str, Any]] = None
+        self._budget = RequestBudget(
+            BUDGET_CAPACITY,
+            BUDGET_REFILL_TIME,
+            BUDGET_DAILY_QUOTA,
+            on_spend=self._save_quota,
+        )
+
+    @staticmethod
+    def _create_session(verify_ssl: bool) -> aiohttp.ClientSession:
+        """Create dedicated HTTP session with persistent connection to API server."""
+        connector = aiohttp.TCPConnector(
+            ssl=(
+                ssl_util.get_default_context()
+                if verify_ssl
+                else ssl_util.get_default_no_verify_context()
+            ),
+            limit=CONNECTIONS_LIMIT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            enable_cleanup_closed=True,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers={aiohttp.hdrs.ACCEPT_ENCODING: ACCEPT_ENCODING},
+        )
+
+    async def async_close(self) -> None:
+        """Stop waiting for request budget and close dedicated HTTP session."""
+        if self._unsub_close is not None:
+            self._unsub_close()
+            self._unsub_close = None
+        self._budget.close()
+        if self._own_session and not self._session.closed:
+            await self._session.close()
+
+    async def _async_handle_close(self, _event: Event) -> None:
+        """Close client when Home Assistant is closing."""
+        self._unsub_close = None
+        await self.async_close()
+
+    def reserve_budget(self, locations: int) -> None:
+        """Size request budget to fit initialization and search at all locations.
+
+        So the first update of every location is served without waiting for refill.
+        """
+        self._budget.resize(
+            max(
+                BUDGET_CAPACITY,
+                REQUEST_COSTS["appInit"] + locations * REQUEST_COSTS["sensorsNearby"],
+            )
+        )
+
+    def server_time(self) -> float:
+        """Return current time by API server clock.
+
+        Timestamps of readings are set by server, so all freshness checks should use
+        this time instead of local one.
+        """
+        return time.time() + (self._clock_offset or 0)
+
+    def _update_clock_offset(self, sample: float) -> None:
+        """Refine server clock offset estimation with new sample."""
+        if self._clock_offset is None:
+            _LOGGER.debug("Server clock offset is %.1fs", sample)
+            self._clock_offset = sample
+        else:
+            self._clock_offset += CLOCK_SMOOTHING * (sample - self._clock_offset)
+
+    def _observe_server_date(self, date: Optional[str], local_ts: float) -> None:
+        """Estimate server clock offset by HTTP Date header of response."""
+        try:
+            server_ts = parsedate_to_datetime(date).timestamp()
+        except (TypeError, ValueError):
+            return
+
+        # Date header is truncated to whole seconds
+        self._update_clock_offset(server_ts + 0.5 - local_ts)
+
+    def _observe_reading_times(self, devices: List[Dict[str, Any]]) -> None:
+        """Correct server clock offset, so no reading is from the future.
+
+        Timestamps of readings can be wrong, so readings too far ahead of estimated
+        server clock are ignored and the rest are smoothed like other samples.
+        """
+        server_ts = self.server_time()
+        latest = max(
+            (
+                ts
+                for d in devices
+                for s in d.get("sensors", ())
+                if (ts := s.get("time", 0)) <= server_ts + CLOCK_TOLERANCE
+            ),
+            default=0,
+        )
+        if latest > server_ts:
+            self._update_clock_offset(latest - time.time())
 
     @property
     def devices(self) -> NARODMON_IDS:
         """Return list of active devices."""
-        return set(self._devices.keys())
+        return set(self._devices)
 
     @devices.setter
     def devices(self, value: NARODMON_IDS) -> None:
         """Set list of active devices."""
-        self._devices = {i: self._devices.get(i, 0) for i in value}
+        value = set(value)
+        for i in set(self._devices) - value:
+            self._remove_device(i)
+        for i in value - set(self._devices):
+            self._devices.push(i)
+
+    def _remove_device(self, device_id: int) -> None:
+        """Stop tracking of device."""
+        self._devices.remove(device_id)
+        for stats in (self._publish_ts, self._cadence, self._poll_misses):
+            stats.pop(device_id, None)
+
+    def set_device_references(self, owner: object, devices: NARODMON_IDS) -> None:
+        """Set devices used by owner. Referenced devices are never evicted."""
+        self._device_refs[owner] = frozenset(devices)
+
+    def cache_info(self) -> CacheInfo:
+        """Return sensors cache statistics."""
+        return CacheInfo(
+            len(self._devices),
+            len(self.sensors),
+            self._evicted_devices,
+            self._evicted_sensors,
+        )
+
+    def _evict(self, now_ts: float) -> None:
+        """Evict expired readings and unused devices from cache.
+
+        Devices which are not referenced by anyone are evicted when their readings
+        expire, or least recently updated first when cache grows over its bound.
+        Readings of referenced devices are kept even when expired, so their owners
+        can tell a dead sensor from a sensor not updated yet.
+        """
+        expire_ts = now_ts - CACHE_TTL.total_seconds()
+        referenced = frozenset().union(*self._device_refs.values())
+        unused = [i for i in self._devices if i not in referenced]
+
+        evicted = {i for i in unused if self._publish_ts.get(i, now_ts) < expire_ts}
+        excess = len(self._devices) - len(evicted) - CACHE_MAX_DEVICES
+        if excess > 0:
+            lru = sorted(
+                (i for i in unused if i not in evicted), key=lambda x: self._devices[x]
+            )
+            evicted.update(lru[:excess])
+
+        for device_id in evicted:
+            self._remove_device(device_id)
+
+        expired = [
+            i
+            for i, sensor in self.sensors.items()
+            if sensor.device.id in evicted
+            or (sensor.time < expire_ts and sensor.device.id not in referenced)
+        ]
+        for sensor_id in expired:
+            self.sensors.pop(sensor_id)
+
+        self._stations.prune(expire_ts)
+
+        if evicted or expired:
+            self._evicted_devices += len(evicted)
+            self._evicted_sensors += len(expired)
+            _LOGGER.debug(
+                "Evicted %d devices and %d sensors from cache",
+                len(evicted),
+                len(expired),
+            )
 
     @property
     def _devices4update(self) -> NARODMON_IDS:
-        result = set(
-            sorted(self._devices.keys(), key=lambda x: self._devices[x])[: self._limit]
-        )
-        return result
+        """Return devices due for update, most overdue first."""
+        return set(self._devices.due(self.server_time(), self._limit))
+
+    def _update_cadence(self, device: Dict[str, Any], now_ts: float) -> None:
+        """Learn device publish cadence and schedule its next update."""
+        device_id = int(device["id"])
+        publish_ts = max((s.get("time", 0) for s in device["sensors"]), default=0)
+        prev_ts = self._publish_ts.get(device_id)
+        cadence = self._cadence.get(device_id)
+        interval_min = POLL_INTERVAL_MIN.total_seconds()
+        interval_max = POLL_INTERVAL_MAX.total_seconds()
+
+        if prev_ts is None or publish_ts > prev_ts:
+            if prev_ts is not None:
+                interval = publish_ts - prev_ts
+                if cadence is not None:
+                    interval = cadence + CADENCE_SMOOTHING * (interval - cadence)
+                cadence = self._cadence[device_id] = min(
+                    max(interval, interval_min), interval_max
+                )
+            self._publish_ts[device_id] = publish_ts
+            self._poll_misses.pop(device_id, None)
+            next_ts = publish_ts + (cadence or interval_min) + POLL_GRACE_TIME
+            if next_ts <= now_ts:
+                next_ts = now_ts + interval_min
+
+        else:
+            # No new data published since last update, so back off
+            misses = self._poll_misses[device_id] = (
+                self._poll_misses.get(device_id, 0) + 1
+            )
+            next_ts = now_ts + min(interval_min * 2**misses, interval_max)
+
+        self._devices.schedule(device_id, next_ts)
 
     async def async_set_nearby_listener(
         self,
@@ -111,19 +525,52 @@ class NarodmonApiClient(Generic[T]):
         latitude: float,
         longitude: float,
         sensor_types: NARODMON_IDS,
+        exclude: Iterable[int] = (),
     ) -> None:
-        """Set listener for nearby sensors async search request."""
+        """Set listener for nearby sensors async search request.
+
+        Requests for locations closer than `NEARBY_MERGE_DISTANCE` are merged into
+        one pending request.
+        """
         _LOGGER.debug(
             "Set new nearby sensors listener: %s @[%f, %f].",
             sensor_types,
             latitude,
             longitude,
         )
-        self._nearby_latitude = latitude
-        self._nearby_longitude = longitude
-        self._nearby_sensor_types = sensor_types
+        sensor_types = set(sensor_types) - self._unavailable_types(
+            latitude, longitude, sensor_types
+        )
+        if not sensor_types:
+            _LOGGER.debug("Sensor types are known to be unavailable. Skip search.")
+            return
+
+        request = self._find_nearby_request(latitude, longitude)
+        if request is None:
+            request = NearbyRequest(latitude, longitude)
+            self._nearby_requests[self._location_key(latitude, longitude)] = request
+
+        request.add_listener(target, sensor_types, exclude)
+
+    def _find_nearby_request(
+        self, latitude: float, longitude: float
+    ) -> Optional[NearbyRequest]:
+        """Return the nearest pending request close enough to location to merge."""
+        nearest, nearest_dist = None, NEARBY_MERGE_DISTANCE
+        for request in self._nearby_requests.values():
+            dist = distance(latitude, longitude, request.latitude, request.longitude)
+            if dist <= nearest_dist:
+                nearest, nearest_dist = request, dist
+        return nearest
 
-        self._nearby_listener = target
+    def _queue_nearby_request(self, request: NearbyRequest) -> None:
+        """Put request with unresolved sensor types back to the pending ones."""
+        pending = self._find_nearby_request(request.latitude, request.longitude)
+        if pending is None:
+            pending = NearbyRequest(request.latitude, request.longitude)
+            key = self._location_key(request.latitude, request.longitude)
+            self._nearby_requests[key] = pending
+        pending.merge(request)
 
     @property
     def _khash(self) -> str:
@@ -148,46 +595,97 @@ class NarodmonApiClient(Generic[T]):
 
     @staticmethod
     def _convert2dict(device: Dict[str, Any]) -> NARODMON_SENSORS_DICT:
-        """Convert device sensors list to dict and set device ID for each sensor."""
-        result = {}
-        dev = device.copy()
-        sensors = dev["sensors"]
-        dev.pop("sensors", None)
+        """Convert device sensors list to dict of sensor readings."""
+        dev = DeviceInfo.from_dict(device)
+        return {
+            int(item["id"]): SensorReading.from_dict(item, dev)
+            for item in device["sensors"]
+        }
 
-        for item in sensors:
-            item["device"] = dev
-            result[int(item["id"])] = item
+    def _is_update_due(self, force: bool) -> bool:
+        """Return True if a new batched update should be started."""
+        task = self._update_task
+        if task is None:
+            return True
+        if not task.done():
+            return False
+        if force or task.cancelled() or task.exception() is not None:
+            return True
+        return time.monotonic() - self._update_ts >= UPDATE_MIN_INTERVAL.total_seconds()
 
-        return result
+    async def async_update_data(
+        self, sensor_ids: Optional[Iterable[int]] = None, force: bool = False
+    ) -> NARODMON_SENSORS_DICT:
+        """Update data and return readings of requested sensors.
 
-    @Throttle(timedelta(minutes=1))
-    async def async_update_data(self) -> NARODMON_SENSORS_DICT:
-        """Update data iterator."""
+        All callers within one update cycle share a single batched API request.
+        Callers stop waiting for it after a timeout while the request goes on, so its
+        results are available to the next update.
+        """
+        if self._is_update_due(force):
+            self._update_ts = time.monotonic()
+            self._update_task = self.hass.async_create_task(self._async_fetch_data())
+
+        await asyncio.wait_for(
+            asyncio.shield(self._update_task), UPDATE_WAIT_TIMEOUT.total_seconds()
+        )
+
+        if sensor_ids is None:
+            return self.sensors
+        return {i: self.sensors[i] for i in sensor_ids if i in self.sensors}
+
+    async def _async_fetch_data(self) -> None:
+        """Fetch data for all known devices in one batch."""
         await self.async_init()
 
-        if self._nearby_listener and (not self.devices or self._sensors_last_updated):
-            await self._async_search_nearby_sensors()
+        if self._nearby_requests:
+            await self._async_process_nearby_requests(network=False)
 
-        elif self.devices:
-            await self._async_update_sensors()
+        if self._nearby_requests and (not self.devices or self._sensors_last_updated):
+            await self._async_process_nearby_requests(network=True)
 
         else:
-            _LOGGER.debug("Nothing to update. :-/")
+            if devices := self._devices4update:
+                await self._async_update_sensors(devices)
+
+            else:
+                _LOGGER.debug("Nothing to update. :-/")
 
-        return self.sensors
+        self._evict(self.server_time())
+
+    async def _async_load_data(self) -> Dict[str, Any]:
+        """Load persistent client data once and keep it in memory."""
+        if self._data is None:
+            data: Dict[str, Any] = await self._store.async_load() or {}
+            if self._data is None:
+                data.setdefault(DATA_LAST_INIT_TS, 0)
+                data.setdefault(DATA_LIMIT, 1)
+                data.setdefault(DATA_NEARBY, {})
+                data.setdefault(DATA_UNAVAILABLE, {})
+                self._budget.restore(data.get(DATA_QUOTA))
+                self._data = data
+        return self._data
+
+    @callback
+    def _async_save_data(self) -> None:
+        """Schedule delayed save of persistent client data."""
+        self._store.async_delay_save(lambda: self._data, DATA_SAVE_DELAY)
+
+    def _save_quota(self) -> None:
+        """Persist daily requests quota accounting."""
+        if self._data is not None:
+            self._data[DATA_QUOTA] = self._budget.as_dict()
+            self._async_save_data()
 
     async def async_init(self) -> None:
         """Initialize API."""
-        store = storage.Store(self.hass, DATA_VERSION, DOMAIN, True)
-        data: Dict[str, Any] = await store.async_load() or {
-            DATA_LAST_INIT_TS: 0,
-        }
+        data = self._data or await self._async_load_data()
 
         now_ts = int(time.time())
         if data[DATA_LAST_INIT_TS] > int(now_ts - 86400):
             return
 
-        await self._async_api_wrapper(
+        await self._async_api_request(
             {
                 "cmd": "appInit",
                 "version": VERSION,
@@ -196,67 +694,492 @@ class NarodmonApiClient(Generic[T]):
         )
 
         data[DATA_LAST_INIT_TS] = now_ts
+        self._async_save_data()
+
+    @staticmethod
+    def _location_key(latitude: float, longitude: float) -> str:
+        """Return storage key for given location."""
+        return f"{latitude:.5f},{longitude:.5f}"
+
+    def _update_limit(self, devices: List[Dict[str, Any]]) -> None:
+        """Raise the learned per-request devices limit if response exceeds it."""
+        if len(devices) > self._limit:
+            self._limit = len(devices)
+            _LOGGER.debug("PubsLimit set to %d", self._limit)
+            if self._data is not None:
+                self._data[DATA_LIMIT] = self._limit
+                self._async_save_data()
+
+    async def async_get_cached_nearby_sensors(
+        self, latitude: float, longitude: float, sensor_types: NARODMON_IDS
+    ) -> Dict[int, int]:
+        """Return previously discovered nearest sensors of defined types for location.
+
+        Found devices are added to the list of active devices, so they can be updated
+        without a new nearby sensors search.
+        """
+        data = self._data or await self._async_load_data()
+        self._limit = max(self._limit, data[DATA_LIMIT])
+
+        expire_ts = int(time.time() - NEARBY_CACHE_TTL.total_seconds())
+        cache = data[DATA_NEARBY].get(self._location_key(latitude, longitude), {})
+
+        nearest: Dict[int, Tuple[float, int, int]] = {}
+        for sensor_id, item in cache.items():
+            if item["type"] in sensor_types and item["ts"] >= expire_ts:
+                candidate = (item["distance"], int(sensor_id), item["device"])
+                nearest[item["type"]] = min(
+                    nearest.get(item["type"], candidate), candidate
+                )
 
-        await store.async_save(data)
+        sensors: Dict[int, int] = {}
+        for _, sensor_id, device_id in nearest.values():
+            sensors[sensor_id] = device_id
+            if device_id not in self._devices:
+                self._devices.push(device_id)
+
+        if sensors:
+            _LOGGER.debug(
+                "Cached sensors found: %s", ", ".join([f"S{i}" for i in sensors])
+            )
+        return sensors
+
+    def _cache_nearby_sensors(
+        self,
+        latitude: float,
+        longitude: float,
+        sensors: Dict[int, Dict[str, Any]],
+        replace: bool = True,
+    ) -> None:
+        """Store discovered sensors for location to persistent cache.
+
+        With `replace` set, previously cached sensors of the same types are dropped.
+        Otherwise only the nearest sensors of each type are kept as candidates.
+        """
+        if self._data is None or not sensors:
+            return
+
+        cache = self._data[DATA_NEARBY].setdefault(
+            self._location_key(latitude, longitude), {}
+        )
+        types = {item["type"] for item in sensors.values()}
+        if replace:
+            for sensor_id in [k for k, v in cache.items() if v["type"] in types]:
+                cache.pop(sensor_id)
+        cache.update({str(k): v for k, v in sensors.items()})
+
+        ranks: Dict[int, int] = {}
+        for sensor_id, item in sorted(cache.items(), key=lambda x: x[1]["distance"]):
+            ranks[item["type"]] = ranks.get(item["type"], 0) + 1
+            if ranks[item["type"]] > NEARBY_CANDIDATES:
+                cache.pop(sensor_id)
+
+        self._async_save_data()
+
+    @staticmethod
+    def _unavailable_ttl(misses: int) -> float:
+        """Return time to skip search for sensor type after number of misses."""
+        return min(
+            UNAVAILABLE_TTL_MIN.total_seconds() * 2 ** (misses - 1),
+            UNAVAILABLE_TTL_MAX.total_seconds(),
+        )
+
+    def _unavailable_types(
+        self, latitude: float, longitude: float, sensor_types: NARODMON_IDS
+    ) -> NARODMON_IDS:
+        """Return sensor types recently not found near location."""
+        if self._data is None:
+            return set()
+
+        now_ts = time.time()
+        cache = self._data[DATA_UNAVAILABLE].get(
+            self._location_key(latitude, longitude), {}
+        )
+        return {
+            stype
+            for stype in sensor_types
+            if (item := cache.get(str(stype)))
+            and item["ts"] + self._unavailable_ttl(item["misses"]) > now_ts
+        }
+
+    def _cache_unavailable_types(
+        self,
+        latitude: float,
+        longitude: float,
+        found: NARODMON_IDS,
+        missing: NARODMON_IDS,
+    ) -> None:
+        """Update persistent cache of sensor types not found near location.
+
+        Each next miss doubles the time before sensor type is searched again.
+        """
+        if self._data is None:
+            return
+
+        key = self._location_key(latitude, longitude)
+        cache = self._data[DATA_UNAVAILABLE].get(key, {})
+        changed = False
+        for stype in found:
+            changed |= cache.pop(str(stype), None) is not None
 
-    async def _async_search_nearby_sensors(self) -> None:
+        if missing:
+            now_ts = int(time.time())
+            for stype in missing:
+                item = cache.get(str(stype), {"misses": 0})
+                cache[str(stype)] = {"misses": item["misses"] + 1, "ts": now_ts}
+            _LOGGER.debug(
+                "Sensor types not found nearby: %s. Next search in %ds",
+                missing,
+                min(self._unavailable_ttl(cache[str(i)]["misses"]) for i in missing),
+            )
+            changed = True
+
+        if cache:
+            self._data[DATA_UNAVAILABLE][key] = cache
+        else:
+            self._data[DATA_UNAVAILABLE].pop(key, None)
+        if changed:
+            self._async_save_data()
+
+    def _index_station(self, device: Dict[str, Any]) -> None:
+        """Add station to the spatial index of known stations."""
+        if "lat" not in device or "lon" not in device:
+            return
+
+        self._stations.add(
+            int(device["id"]),
+            device["lat"],
+            device["lon"],
+            {int(s["id"]): (s["type"], s.get("time", 0)) for s in device["sensors"]},
+        )
+
+    async def _async_process_nearby_requests(self, network: bool) -> None:
+        """Resolve pending nearby sensors search requests in turn.
+
+        Each request is resolved among known stations first, so it can benefit from
+        areas covered by previous requests. With `network` set, the rest of sensor
+        types is searched by API request and the request is completed.
+
+        Listeners set while a request is in progress go to a new pending request, so
+        no sensor type is left unsearched.
+        """
+        for key in list(self._nearby_requests):
+            request = self._nearby_requests.pop(key)
+            await self._async_search_local_sensors(request)
+            if not request.sensor_types:
+                continue
+
+            if network:
+                await self._async_search_nearby_sensors(request)
+            else:
+                self._queue_nearby_request(request)
+
+    @staticmethod
+    async def _async_notify_nearby(
+        request: NearbyRequest, found: Dict[int, Tuple[int, int]]
+    ) -> None:
+        """Send found sensors to listeners of nearby sensors search request."""
+        for listener, types in request.listeners:
+            sensors = {i: dev for i, (dev, stype) in found.items() if stype in types}
+            if sensors:
+                await listener(sensors)
+
+    def _failover_candidates(
+        self, request: NearbyRequest
+    ) -> Dict[int, Tuple[int, int]]:
+        """Pick nearest fallback candidates not known to be stale for request.
+
+        Candidates are the runners-up remembered from previous nearby sensors search
+        for the same location, so failover needs no API request. Failing sensors
+        excluded by request and sensors with stale readings are skipped. Devices of
+        picked candidates are due for update at once, so their readings arrive
+        within the same update.
+        """
+        if self._data is None:
+            return {}
+
+        fresh_ts = self.server_time() - FRESHNESS_TIME
+        expire_ts = time.time() - NEARBY_CACHE_TTL.total_seconds()
+        cache = self._data[DATA_NEARBY].get(
+            self._location_key(request.latitude, request.longitude), {}
+        )
+
+        found: Dict[int, Tuple[int, int]] = {}
+        for sensor_id, item in sorted(cache.items(), key=lambda x: x[1]["distance"]):
+            stype = item["type"]
+            sensor = self.sensors.get(int(sensor_id))
+            if (
+                stype not in request.sensor_types
+                or item["ts"] < expire_ts
+                or int(sensor_id) in request.exclude
+                or (sensor is not None and sensor.time < fresh_ts)
+            ):
+                continue
+
+            request.sensor_types.discard(stype)
+            found[int(sensor_id)] = (item["device"], stype)
+            if item["device"] not in self._devices:
+                self._devices.push(item["device"])
+            self._devices.schedule(item["device"], 0)
+
+        return found
+
+    async def _async_search_local_sensors(self, request: NearbyRequest) -> None:
+        """Search for nearby sensors of defined types among known stations.
+
+        Sensor types not resolved by spatial index fail over to remembered candidates.
+        """
+        now_ts = int(time.time())
+
+        fresh_ts = self.server_time() - FRESHNESS_TIME
+        matches = self._stations.nearby(
+            request.latitude,
+            request.longitude,
+            request.sensor_types,
+            fresh_ts,
+            exclude=request.exclude.union(
+                i for i, x in self.sensors.items() if x.time < fresh_ts
+            ),
+        )
+        if matches:
+            found: Dict[int, Tuple[int, int]] = {}
+            cache: Dict[int, Dict[str, Any]] = {}
+            for stype, match in matches.items():
+                request.sensor_types.discard(stype)
+                found[match.sensor_id] = (match.device_id, stype)
+                cache[match.sensor_id] = {
+                    "device": match.device_id,
+                    "type": stype,
+                    "distance": round(match.distance, 2),
+                    "ts": now_ts,
+                }
+                if match.device_id not in self._devices:
+                    self._devices.push(match.device_id)
+
+            self._cache_nearby_sensors(
+                request.latitude, request.longitude, cache, replace=False
+            )
+
+            _LOGGER.debug(
+                "New sensors found locally: %s", ", ".join([f"S{i}" for i in found])
+            )
+            await self._async_notify_nearby(request, found)
+
+        if request.sensor_types and (found := self._failover_candidates(request)):
+            _LOGGER.debug(
+                "Failover to sensors: %s", ", ".join([f"S{i}" for i in found])
+            )
+            await self._async_notify_nearby(request, found)
+
+    async def _async_search_nearby_sensors(self, request: NearbyRequest) -> None:
         """Search for nearby sensors of defined types."""
         now_ts = int(time.time())
+        types = set(request.sensor_types)
 
-        data = await self._async_api_wrapper(
+        data = await self._async_api_request(
             {
                 "cmd": "sensorsNearby",
-                "lat": self._nearby_latitude,
-                "lon": self._nearby_longitude,
-                "types": ",".join([str(i) for i in self._nearby_sensor_types]),
+                "lat": request.latitude,
+                "lon": request.longitude,
+                "types": ",".join([str(i) for i in sorted(types)]),
             }
         )
         self._sensors_last_updated = not self._devices
         devices = data.get("devices", {})
+        self._update_limit(devices)
+        self._observe_reading_times(devices)
+        server_ts = int(self.server_time())
 
-        if len(devices) > self._limit:
-            self._limit = len(devices)
-            _LOGGER.debug("PubsLimit set to %d", self._limit)
+        if devices:
+            self._stations.add_coverage(
+                request.latitude,
+                request.longitude,
+                max(x["distance"] for x in devices),
+                types,
+            )
 
-        sensors: Dict[int, int] = {}
+        found: Dict[int, Tuple[int, int]] = {}
+        cache: Dict[int, Dict[str, Any]] = {}
         for device in sorted(data["devices"], key=lambda x: x["distance"]):
+            self._index_station(device)
             for sensor in device["sensors"]:
-                if sensor["type"] in self._nearby_sensor_types:
-                    self._nearby_sensor_types.remove(sensor["type"])
-                    sensors[sensor["id"]] = device["id"]
+                if sensor["type"] not in types:
+                    continue
+
+                # Remember runners-up as fallback candidates
+                cache[int(sensor["id"])] = {
+                    "device": int(device["id"]),
+                    "type": sensor["type"],
+                    "distance": device["distance"],
+                    "ts": now_ts,
+                }
+
+                if (
+                    sensor["type"] in request.sensor_types
+                    and int(sensor["id"]) not in request.exclude
+                ):
+                    request.sensor_types.remove(sensor["type"])
+                    found[int(sensor["id"])] = (int(device["id"]), sensor["type"])
                     if device["id"] not in self._devices:
-                        self._devices[int(device["id"])] = now_ts
+                        self._devices.push(int(device["id"]), server_ts)
+                        self._update_cadence(device, server_ts)
                         self.sensors.update(self._convert2dict(device))
 
-        _LOGGER.debug("New sensors found: %s", ", ".join([f"S{i}" for i in sensors]))
-        if self._nearby_listener:
-            await self._nearby_listener(sensors)
-        self._nearby_listener = None
+        self._cache_nearby_sensors(request.latitude, request.longitude, cache)
+        self._cache_unavailable_types(
+            request.latitude,
+            request.longitude,
+            types - request.sensor_types,
+            types & request.sensor_types,
+        )
 
-    async def _async_update_sensors(self) -> None:
-        """Update known sensors."""
-        now_ts = int(time.time())
+        _LOGGER.debug("New sensors found: %s", ", ".join([f"S{i}" for i in found]))
+        await self._async_notify_nearby(request, found)
 
-        data = await self._async_api_wrapper(
-            {
-                "cmd": "sensorsOnDevice",
-                "devices": ",".join([str(i) for i in self._devices4update]),
-            }
+    async def _async_update_sensors(
+        self, devices: Optional[NARODMON_IDS] = None
+    ) -> None:
+        """Update known sensors."""
+        data = await self._async_api_request(
+            {"cmd": "sensorsOnDevice"}, devices=devices or self._devices4update
         )
         self._sensors_last_updated = True
         devices = data.get("devices", {})
-
-        if len(devices) > self._limit:
-            self._limit = len(devices)
-            _LOGGER.debug("PubsLimit set to %d", self._limit)
+        self._update_limit(devices)
+        self._observe_reading_times(devices)
+        now_ts = int(self.server_time())
 
         for device in devices:
-            self._devices[int(device["id"])] = now_ts
+            self._devices.push(int(device["id"]), now_ts)
+            self._update_cadence(device, now_ts)
+            self._index_station(device)
             self.sensors.update(self._convert2dict(device))
 
-    async def _async_api_wrapper(
-        self, data: Dict[str, Union[str, int, float]]
+    async def _async_api_request(
+        self, data: NARODMON_REQUEST, devices: Optional[NARODMON_IDS] = None
+    ) -> Dict[str, Any]:
+        """Send request to the API, coalescing it with an in-flight one.
+
+        A request is coalesced when an identical request for the same or a wider
+        set of devices is already in progress. Its result is shared by every waiter.
+        """
+        params = tuple(sorted(data.items()))
+        wanted = frozenset(devices or ())
+
+        for key, covered, task in self._inflight:
+            if key == params and wanted <= covered:
+                _LOGGER.debug("Request coalesced with in-flight one: '%s'", data)
+                return await asyncio.shield(task)
+
+        if devices:
+            data = {**data, "devices": ",".join([str(i) for i in sorted(devices)])}
+
+        task = self.hass.async_create_task(self._async_budgeted_request(data))
+        entry = (params, wanted, task)
+        self._inflight.append(entry)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._inflight.remove(entry)
+
+    async def _async_budgeted_request(self, data: NARODMON_REQUEST) -> Dict[str, Any]:
+        """Wait for request budget and send request to the API.
+
+        Requests are rejected at once while the API is failing.
+        """
+        if not self._breaker.allow():
+            raise ApiError(
+                f"API requests are suspended for {self._breaker.retry_after:.0f}s"
+            )
+
+        cmd = data["cmd"]
+        cost = REQUEST_COSTS.get(cmd, 1)
+        try:
+            await self._budget.async_acquire(
+                cost, REQUEST_PRIORITIES.get(cmd, PRIORITY_UPDATE)
+            )
+            if self._hedge_requests:
+                result = await self._async_hedged_request(data, cost)
+            else:
+                result = await self._async_timed_request(data)
+
+        except asyncio.CancelledError:
+            self._breaker.abort()
+            raise
+
+        except ApiError as exception:
+            self._breaker.record_failure(ERRNO_COOLDOWNS.get(exception.errno))
+            raise
+
+        except Exception:  # pylint: disable=broad-except
+            self._breaker.record_failure()
+            raise
+
+        self._breaker.record_success()
+        return result
+
+    async def _async_timed_request(self, data: NARODMON_REQUEST) -> Dict[str, Any]:
+        """Send request to the API and track its latency.
+
+        Latencies of failed requests are tracked too, so slow requests are not left
+        out of statistics.
+        """
+        started = time.monotonic()
+        try:
+            result = await self._async_api_wrapper(data)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._latency.add(data["cmd"], time.monotonic() - started)
+            raise
+
+        self._latency.add(data["cmd"], time.monotonic() - started)
+        return result
+
+    async def _async_hedged_request(
+        self, data: NARODMON_REQUEST, cost: float
     ) -> Dict[str, Any]:
+        """Send request to the API and hedge it with a duplicate when it is slow.
+
+        The duplicate is sent when the request lasts longer than most requests of the
+        same kind and budget allows it. The first successful answer wins, the other
+        request is cancelled.
+        """
+        delay = self._latency.percentile(data["cmd"], HEDGE_PERCENTILE)
+        started = time.monotonic()
+        pending = {self.hass.async_create_task(self._async_timed_request(dict(data)))}
+        primary = next(iter(pending))
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(
+                    pending, timeout=max(delay, HEDGE_MIN_DELAY)
+                )
+                if not done and self._budget.try_acquire(cost):
+                    _LOGGER.debug("Request is slow. Send hedged request: '%s'", data)
+                    pending.add(
+                        self.hass.async_create_task(
+                            self._async_timed_request(dict(data))
+                        )
+                    )
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+
+            return primary.result()
+
+        finally:
+            if primary in pending:
+                # Slow request lost to the hedge, but its latency is at least that long
+                self._latency.add(data["cmd"], time.monotonic() - started)
+            for task in pending:
+                task.cancel()
+
+    async def _async_api_wrapper(self, data: NARODMON_REQUEST) -> Dict[str, Any]:
         """Get information from the API."""
 
         data["uuid"] = await instance_id.async_get(self.hass)
@@ -267,21 +1190,25 @@ class NarodmonApiClient(Generic[T]):
         data["lang"] = "en"
 
         try:
-            async with async_timeout.timeout(self._timeout):
-                async with self._session.post(
-                    ENDPOINT_URL, headers=HEADERS, json=data
-                ) as resp:
-                    if resp.status != HTTPStatus.OK:
-                        raise ApiError(
-                            f"Invalid response from Narodmon API: {resp.status}"
-                        )
-                    _LOGGER.debug("Response: '%s'", await resp.text())
-                    result = await resp.json()
+            sent_ts = time.time()
+            async with self._session.post(
+                ENDPOINT_URL, headers=HEADERS, json=data, timeout=self._timeout
+            ) as resp:
+                self._observe_server_date(
+                    resp.headers.get(aiohttp.hdrs.DATE), (sent_ts + time.time()) / 2
+                )
+                if resp.status != HTTPStatus.OK:
+                    raise ApiError(f"Invalid response from Narodmon API: {resp.status}")
+                body = await resp.read()
+
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug("Response: '%s'", body.decode(errors="replace"))
+            result = json_loads(body)
 
-                if "error" in result:
-                    raise ApiError(result["error"], errno=result["errno"])
+            if "error" in result:
+                raise ApiError(result["error"], errno=result["errno"])
 
-                return result
+            return result
 
         except ApiError as exception:
             _LOGGER.error("[%s] %s", exception.errno, exception.status)
@@ -295,7 +1222,7 @@ class NarodmonApiClient(Generic[T]):
             )
             raise exception
 
-        except (KeyError, TypeError) as exception:
+        except (KeyError, TypeError, ValueError) as exception:
             _LOGGER.error(
                 "Error parsing information from %s - %s",
                 ENDPOINT_URL,
@@ -0,0 +1,105 @@
+#  Copyright (c) 2021-2022, Andrey "Limych" Khrolenok <andrey@khrolenok.ru>
+#  Creative Commons BY-NC-SA 4.0 International Public License
+#  (see LICENSE.md or https://creativecommons.org/licenses/by-nc-sa/4.0/)
+"""The NarodMon Cloud Integration Component.
+
+For more details about this sensor, please refer to the documentation at
+https://github.com/Limych/ha-narodmon/
+"""
+import logging
+import random
+import time
+from typing import Final, Optional
+
+_LOGGER: Final = logging.getLogger(__package__)
+
+STATE_CLOSED: Final = "closed"
+STATE_OPEN: Final = "open"
+STATE_HALF_OPEN: Final = "half_open"
+
+
+class CircuitBreaker:
+    """Circuit breaker with exponential backoff and jitter.
+
+    Breaker opens after a number of consecutive failures and rejects all requests
+    until backoff time is over. Then a single probe request is let through. Its
+    success closes the breaker, its failure opens it again for a longer time.
+    """
+
+    def __init__(self, threshold: int, base_delay: float, max_delay: float) -> None:
+        """Initialize breaker."""
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opens = 0
+        self._open_until: float = 0
+
+    @property
+    def state(self) -> str:
+        """Return current breaker state."""
+        if self._state == STATE_OPEN and time.monotonic() >= self._open_until:
+            return STATE_HALF_OPEN
+        return self._state
+
+    @property
+    def retry_after(self) -> float:
+        """Return seconds left until next probe request is allowed."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        """Return True if request can be sent now."""
+        if self._state == STATE_CLOSED:
+            return True
+        if self._state == STATE_OPEN and time.monotonic() >= self._open_until:
+            self._state = STATE_HALF_OPEN
+            return True  # Probe request
+        return False
+
+    def record_success(self) -> None:
+        """Close breaker after successful request."""
+        if self._state != STATE_CLOSED:
+            _LOGGER.info("API is available again. Requests are resumed")
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opens = 0
+
+    def abort(self) -> None:
+        """Let another probe request through when current one was cancelled."""
+        if self._state == STATE_HALF_OPEN:
+            self._state = STATE_OPEN
+
+    def record_failure(self, cooldown: Optional[float] = None) -> None:
+        """Count failed request and open breaker when needed.
+
+        With `cooldown` set breaker opens at once for no less than that time.
+        """
+        self._failures += 1
+        if self._state == STATE_OPEN:
+            # Failures of requests sent before breaker has opened
+            if cooldown is not None:
+                self._open_until = max(self._open_until, time.monotonic() + cooldown)
+            return
+
+        if (
+            cooldown is None
+            and self._state == STATE_CLOSED
+            and self._failures < self.threshold
+        ):
+            return
+
+        delay = min(self.max_delay, self.base_delay * 2**self._opens)
+        delay = random.uniform(delay / 2, delay)
+        if cooldown is not None:
+            delay = max(delay, cooldown)
+
+        self._opens += 1
+        self._state = STATE_OPEN
+        self._open_until = time.monotonic() + delay
+        _LOGGER.warning(
+            "API requests are suspended for %ds after %d failed requests",
+            delay,
+            self._failures,
+        )
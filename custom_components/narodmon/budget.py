@@ -0,0 +1,194 @@
+#  Copyright (c) 2021-2022, Andrey "Limych" Khrolenok <andrey@khrolenok.ru>
+#  Creative Commons BY-NC-SA 4.0 International Public License
+#  (see LICENSE.md or https://creativecommons.org/licenses/by-nc-sa/4.0/)
+"""The NarodMon Cloud Integration Component.
+
+For more details about this sensor, please refer to the documentation at
+https://github.com/Limych/ha-narodmon/
+"""
+import asyncio
+from collections.abc import Callable
+from datetime import timedelta
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Dict, Final, List, Optional, Tuple
+
+from homeassistant.util import dt as dt_util
+
+_LOGGER: Final = logging.getLogger(__package__)
+
+PRIORITY_INIT: Final = 0
+PRIORITY_UPDATE: Final = 1
+PRIORITY_DISCOVERY: Final = 2
+
+ATTR_DAY: Final = "day"
+ATTR_USED: Final = "used"
+
+
+class BudgetClosedError(Exception):
+    """Request budget is closed."""
+
+
+class RequestBudget:
+    """Token bucket request budget with priority queue and daily quota.
+
+    Callers wait in the queue until the budget allows them to proceed. Waiters with
+    lower priority value are served first, equal priorities are served in order.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_time: float,
+        daily_quota: float,
+        on_spend: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """Initialize budget.
+
+        Bucket holds up to `capacity` tokens and gets one token per `refill_time`
+        seconds. No more than `daily_quota` tokens can be spent per UTC day.
+        """
+        self.capacity = capacity
+        self.refill_time = refill_time
+        self.daily_quota = daily_quota
+
+        self._on_spend = on_spend
+        self._tokens = capacity
+        self._refilled = time.monotonic()
+        self._day = self._today()
+        self._used: float = 0
+        self._queue: List[Tuple[int, int, float, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._closed = False
+
+    @staticmethod
+    def _today() -> str:
+        """Return current quota day."""
+        return dt_util.utcnow().date().isoformat()
+
+    @property
+    def used(self) -> float:
+        """Return amount of daily quota spent today."""
+        self._roll_day()
+        return self._used
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return daily quota accounting for storage."""
+        return {ATTR_DAY: self._day, ATTR_USED: self._used}
+
+    def restore(self, data: Optional[Dict[str, Any]]) -> None:
+        """Restore daily quota accounting from storage."""
+        self._roll_day()
+        if data and data.get(ATTR_DAY) == self._day:
+            self._used += data.get(ATTR_USED, 0)
+
+    def _roll_day(self) -> None:
+        """Reset daily quota accounting when day is over."""
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._used = 0
+
+    def _refill(self) -> None:
+        """Add tokens accumulated since last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._refilled) / self.refill_time
+        )
+        self._refilled = now
+
+    def _spend(self, cost: float) -> None:
+        """Charge cost against budget."""
+        self._tokens -= cost
+        self._used += cost
+        if self._on_spend is not None:
+            self._on_spend()
+
+    async def async_acquire(self, cost: float, priority: int = PRIORITY_UPDATE) -> None:
+        """Wait until cost can be charged against budget."""
+        if self._closed:
+            raise BudgetClosedError("Request budget is closed")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), cost, future))
+        self._process()
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._process()
+            raise
+
+    def try_acquire(self, cost: float) -> bool:
+        """Charge cost against budget if it is possible right now.
+
+        Never jumps ahead of callers waiting in the queue.
+        """
+        if any(not item[3].done() for item in self._queue):
+            return False
+
+        self._refill()
+        self._roll_day()
+        if self._tokens < cost or self._used + cost > self.daily_quota:
+            return False
+
+        self._spend(cost)
+        return True
+
+    def resize(self, capacity: float) -> None:
+        """Change bucket capacity. Growth of capacity is available at once."""
+        self._refill()
+        self._tokens = min(self._tokens + max(capacity - self.capacity, 0), capacity)
+        self.capacity = capacity
+        self._process()
+
+    def close(self) -> None:
+        """Stop serving callers and fail all waiting ones."""
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        for *_, future in self._queue:
+            if not future.done():
+                future.set_exception(BudgetClosedError("Request budget is closed"))
+        self._queue.clear()
+
+    def _process(self) -> None:
+        """Serve waiting callers within budget."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._closed:
+            return
+
+        self._refill()
+        delay = None
+        while self._queue:
+            _, _, cost, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            self._roll_day()
+            if self._used + cost > self.daily_quota:
+                now = dt_util.utcnow()
+                tomorrow = (now + timedelta(days=1)).replace(
+                    hour=0, minute=0, second=0, microsecond=0
+                )
+                delay = max((tomorrow - now).total_seconds(), 1)
+                _LOGGER.debug("Daily request quota exhausted. Waiting %ds", delay)
+                break
+
+            if self._tokens < cost:
+                delay = (cost - self._tokens) * self.refill_time
+                break
+
+            heapq.heappop(self._queue)
+            self._spend(cost)
+            future.set_result(None)
+
+        if delay is not None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._process)
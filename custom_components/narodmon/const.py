@@ -37,11 +37,17 @@ ISSUE_URL: Final = "https://github.com/Limych/ha-narodmon/issues"
 
 # Configuration and options
 CONF_APIKEY: Final = "apikey"
+CONF_DEDICATED_SESSION: Final = "dedicated_session"
+CONF_HEDGE_REQUESTS: Final = "hedge_requests"
+CONF_RESTORE_TIME: Final = "restore_time"
 
 # Defaults
 DEFAULT_SCAN_INTERVAL: Final = timedelta(minutes=3)
 DEFAULT_VERIFY_SSL: Final = True
 DEFAULT_TIMEOUT: Final = 10  # seconds
+DEFAULT_DEDICATED_SESSION: Final = False
+DEFAULT_HEDGE_REQUESTS: Final = False
+DEFAULT_RESTORE_TIME: Final = timedelta(hours=1)
 
 # Attributes
 ATTR_DISTANCE: Final = "distance"
@@ -49,8 +55,15 @@ ATTR_DEVICE_NAME: Final = "device_name"
 ATTR_SENSOR_ID: Final = "sensor_id"
 ATTR_SENSOR_NAME: Final = "sensor_name"
 
+# Sensor type settings
+ATTR_DEADBAND: Final = "deadband"  # (absolute, relative) change to write state
+
 
 FRESHNESS_TIME: Final = 20 * 60  # seconds
+POLL_JITTER: Final = 10  # seconds
+
+STATE_MIN_WRITE_INTERVAL: Final = timedelta(minutes=1)
+STATE_HEARTBEAT_INTERVAL: Final = timedelta(minutes=30)
 
 KHASH: Final = "\x90G2çÒ\x8bÞ¨\x13\x006ª4"
 
@@ -76,6 +89,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: UnitOfTemperature.CELSIUS,
         ATTR_DEVICE_CLASS: SensorDeviceClass.TEMPERATURE,
         ATTR_ICON: None,
+        ATTR_DEADBAND: (0.2, 0),
     },
     "humidity": {
         ATTR_ID: 2,
@@ -83,6 +97,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: PERCENTAGE,
         ATTR_DEVICE_CLASS: SensorDeviceClass.HUMIDITY,
         ATTR_ICON: None,
+        ATTR_DEADBAND: (1, 0),
     },
     "pressure": {
         ATTR_ID: 3,
@@ -90,6 +105,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: UnitOfPressure.MMHG,
         ATTR_DEVICE_CLASS: SensorDeviceClass.PRESSURE,
         ATTR_ICON: None,
+        ATTR_DEADBAND: (0.3, 0),
     },
     "wind_speed": {
         ATTR_ID: 4,
@@ -97,6 +113,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: UnitOfSpeed.METERS_PER_SECOND,
         ATTR_DEVICE_CLASS: None,
         ATTR_ICON: "mdi:weather-windy",
+        ATTR_DEADBAND: (0.3, 0),
     },
     "wind_bearing": {
         ATTR_ID: 5,
@@ -104,6 +121,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: DEGREE,
         ATTR_DEVICE_CLASS: None,
         ATTR_ICON: "mdi:weather-windy",
+        ATTR_DEADBAND: (10, 0),
     },
     "precipitation": {
         ATTR_ID: 9,
@@ -111,6 +129,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: UnitOfLength.MILLIMETERS,
         ATTR_DEVICE_CLASS: None,
         ATTR_ICON: "mdi:weather-pouring",
+        ATTR_DEADBAND: (0, 0),
     },
     "illuminance": {
         ATTR_ID: 11,
@@ -118,6 +137,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: LIGHT_LUX,
         ATTR_DEVICE_CLASS: SensorDeviceClass.ILLUMINANCE,
         ATTR_ICON: None,
+        ATTR_DEADBAND: (0, 0.1),
     },
     "radiation": {
         ATTR_ID: 12,
@@ -125,6 +145,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: MICROROENTGEN_PER_HOUR,
         ATTR_DEVICE_CLASS: None,
         ATTR_ICON: "mdi:radioactive",
+        ATTR_DEADBAND: (0, 0.1),
     },
     "uv": {
         ATTR_ID: 20,
@@ -132,6 +153,7 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: UV_INDEX,
         ATTR_DEVICE_CLASS: None,
         ATTR_ICON: "mdi:weather-sunny",
+        ATTR_DEADBAND: (0.2, 0),
     },
     "pm": {
         ATTR_ID: 22,
@@ -139,5 +161,6 @@ SENSOR_TYPES: Final = {
         ATTR_UNIT_OF_MEASUREMENT: CONCENTRATION_MICROGRAMS_PER_CUBIC_METER,
         ATTR_DEVICE_CLASS: None,
         ATTR_ICON: "mdi:air-filter",
+        ATTR_DEADBAND: (0, 0.1),
     },
 }
@@ -0,0 +1,38 @@
+#  Copyright (c) 2021-2022, Andrey "Limych" Khrolenok <andrey@khrolenok.ru>
+#  Creative Commons BY-NC-SA 4.0 International Public License
+#  (see LICENSE.md or https://creativecommons.org/licenses/by-nc-sa/4.0/)
+"""The NarodMon Cloud Integration Component.
+
+For more details about this sensor, please refer to the documentation at
+https://github.com/Limych/ha-narodmon/
+"""
+from collections import deque
+import math
+from typing import Deque, Dict, Hashable, Optional
+
+
+class LatencyTracker:
+    """Rolling window of request latencies per request kind."""
+
+    def __init__(self, window: int, min_samples: int) -> None:
+        """Initialize tracker.
+
+        Keeps up to `window` last latencies per kind. Percentiles are known only when
+        at least `min_samples` latencies are collected.
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[Hashable, Deque[float]] = {}
+
+    def add(self, kind: Hashable, latency: float) -> None:
+        """Add request latency."""
+        self._samples.setdefault(kind, deque(maxlen=self.window)).append(latency)
+
+    def percentile(self, kind: Hashable, percent: float) -> Optional[float]:
+        """Return latency percentile for request kind or None if unknown yet."""
+        samples = self._samples.get(kind)
+        if samples is None or len(samples) < self.min_samples:
+            return None
+
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, math.ceil(percent * len(ordered)) - 1)]
@@ -0,0 +1,133 @@
+#  Copyright (c) 2021-2022, Andrey "Limych" Khrolenok <andrey@khrolenok.ru>
+#  Creative Commons BY-NC-SA 4.0 International Public License
+#  (see LICENSE.md or https://creativecommons.org/licenses/by-nc-sa/4.0/)
+"""The NarodMon Cloud Integration Component.
+
+For more details about this sensor, please refer to the documentation at
+https://github.com/Limych/ha-narodmon/
+"""
+import heapq
+from typing import Dict, Iterator, List, Tuple
+
+
+class DeviceScheduler:
+    """Indexed binary min-heap of devices ordered by next update time.
+
+    Devices with the same next update time are ordered by last update time, so the
+    least recently updated devices go first. Adding, rescheduling and removing of a
+    device take O(log n), selection of k due devices takes O(k log k).
+    """
+
+    def __init__(self) -> None:
+        """Initialize scheduler."""
+        # Heap entries are [next_ts, updated_ts, device_id]
+        self._heap: List[List] = []
+        self._index: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        """Return number of scheduled devices."""
+        return len(self._heap)
+
+    def __contains__(self, device_id: object) -> bool:
+        """Return True if device is scheduled."""
+        return device_id in self._index
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over scheduled devices."""
+        return iter(list(self._index))
+
+    def __getitem__(self, device_id: int) -> float:
+        """Return last update time of device."""
+        return self._heap[self._index[device_id]][1]
+
+    def next_update(self, device_id: int) -> float:
+        """Return next update time of device."""
+        return self._heap[self._index[device_id]][0]
+
+    def push(self, device_id: int, updated_ts: float = 0) -> None:
+        """Add device or set its last update time."""
+        pos = self._index.get(device_id)
+        if pos is None:
+            self._heap.append([0, updated_ts, device_id])
+            self._index[device_id] = len(self._heap) - 1
+            self._sift_up(len(self._heap) - 1)
+        else:
+            self._heap[pos][1] = updated_ts
+            self._restore(pos)
+
+    def schedule(self, device_id: int, next_ts: float) -> None:
+        """Set next update time of device."""
+        pos = self._index[device_id]
+        self._heap[pos][0] = next_ts
+        self._restore(pos)
+
+    def remove(self, device_id: int) -> None:
+        """Remove device from scheduler."""
+        pos = self._index.pop(device_id)
+        last = self._heap.pop()
+        if pos < len(self._heap):
+            self._heap[pos] = last
+            self._index[last[2]] = pos
+            self._restore(pos)
+
+    def due(self, now_ts: float, limit: int) -> List[int]:
+        """Return up to `limit` devices due for update at given time."""
+        result: List[int] = []
+        if not self._heap or limit <= 0:
+            return result
+
+        heap = self._heap
+        candidates: List[Tuple[float, float, int]] = [(heap[0][0], heap[0][1], 0)]
+        while candidates and len(result) < limit:
+            next_ts, _, pos = heapq.heappop(candidates)
+            if next_ts > now_ts:
+                break
+            result.append(heap[pos][2])
+            for child in (2 * pos + 1, 2 * pos + 2):
+                if child < len(heap):
+                    heapq.heappush(candidates, (heap[child][0], heap[child][1], child))
+
+        return result
+
+    @staticmethod
+    def _less(left: List, right: List) -> bool:
+        """Return True if left entry should go before right one."""
+        return left[0] < right[0] or (left[0] == right[0] and left[1] < right[1])
+
+    def _restore(self, pos: int) -> None:
+        """Restore heap invariant after entry at position has changed."""
+        if pos > 0 and self._less(self._heap[pos], self._heap[(pos - 1) // 2]):
+            self._sift_up(pos)
+        else:
+            self._sift_down(pos)
+
+    def _swap(self, i: int, j: int) -> None:
+        """Swap two heap entries."""
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._index[heap[i][2]] = i
+        self._index[heap[j][2]] = j
+
+    def _sift_up(self, pos: int) -> None:
+        """Move entry up until heap invariant holds."""
+        heap = self._heap
+        while pos > 0:
+            parent = (pos - 1) // 2
+            if not self._less(heap[pos], heap[parent]):
+                break
+            self._swap(pos, parent)
+            pos = parent
+
+    def _sift_down(self, pos: int) -> None:
+        """Move entry down until heap invariant holds."""
+        heap = self._heap
+        size = len(heap)
+        while True:
+            smallest = pos
+            for child in (2 * pos + 1, 2 * pos + 2):
+                if child < size and self._less(heap[child], heap[smallest]):
+                    smallest = child
+            if smallest == pos:
+                break
+            self._swap(pos, smallest)
+            pos = smallest
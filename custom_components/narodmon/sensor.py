@@ -6,11 +6,11 @@
 For more details about this sensor, please refer to the documentation at
 https://github.com/Limych/ha-narodmon/
 """
+from datetime import datetime, timedelta
 import logging
-import time
-from typing import Final
+from typing import Final, Optional
 
-from homeassistant.components.sensor import SensorEntity
+from homeassistant.components.sensor import RestoreSensor
 from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
 from homeassistant.const import (
     ATTR_ATTRIBUTION,
@@ -26,27 +26,47 @@ from homeassistant.const import (
     CONF_DEVICES,
     CONF_NAME,
     CONF_SENSORS,
+    STATE_UNAVAILABLE,
+    STATE_UNKNOWN,
 )
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.typing import StateType
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.util import dt as dt_util
 
 from . import YAML_DOMAIN
 from .const import (
+    ATTR_DEADBAND,
     ATTR_DEVICE_NAME,
     ATTR_DISTANCE,
     ATTR_SENSOR_ID,
     ATTR_SENSOR_NAME,
     ATTRIBUTION,
+    CONF_RESTORE_TIME,
+    DEFAULT_RESTORE_TIME,
     DOMAIN,
     FRESHNESS_TIME,
     NAME,
     SENSOR_TYPES,
+    STATE_HEARTBEAT_INTERVAL,
+    STATE_MIN_WRITE_INTERVAL,
     VERSION,
 )
 
 _LOGGER: Final = logging.getLogger(__name__)
 
+RESTORED_ATTRIBUTES: Final = (
+    ATTR_ATTRIBUTION,
+    ATTR_SENSOR_ID,
+    ATTR_SENSOR_NAME,
+    ATTR_DEVICE_ID,
+    ATTR_DEVICE_NAME,
+    ATTR_DISTANCE,
+    ATTR_LOCATION,
+    ATTR_LATITUDE,
+    ATTR_LONGITUDE,
+)
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_devices):
     """Set up sensor platform."""
@@ -57,6 +77,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_d
             coordinator = hass.data[DOMAIN][entry.entry_id][index]
             name = device_config.get(CONF_NAME, hass.config.location_name)
             types = device_config.get(CONF_SENSORS, SENSOR_TYPES.keys())
+            restore_time = device_config.get(CONF_RESTORE_TIME, DEFAULT_RESTORE_TIME)
 
             sensors = []
             for stype in types:
@@ -67,6 +88,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_d
                         stype,
                         vdev_id,
                         entity_name,
+                        restore_time,
                     )
                 )
             if sensors:
@@ -78,15 +100,31 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_d
 
 
 # pylint: disable=too-many-instance-attributes
-class NarodmonSensor(CoordinatorEntity, SensorEntity):
+class NarodmonSensor(CoordinatorEntity, RestoreSensor):
     """Implementation of an NarodMon sensor."""
 
-    def __init__(self, coordinator, sensor_type: str, vdev_id: str, name: str):
+    def __init__(
+        self,
+        coordinator,
+        sensor_type: str,
+        vdev_id: str,
+        name: str,
+        restore_time: timedelta = DEFAULT_RESTORE_TIME,
+    ):
         """Class initialization."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, SENSOR_TYPES[sensor_type].get(ATTR_ID))
 
         self._sensor_type_id = SENSOR_TYPES[sensor_type].get(ATTR_ID)
         self._sensor_id = None
+        self._restore_time = restore_time
+        self._restored_until = None
+        self._deadband = SENSOR_TYPES[sensor_type].get(ATTR_DEADBAND, (0, 0))
+        self._written_value = None
+        self._written_sensor_id = None
+        self._written_available: Optional[bool] = None
+        self._written_at = None
+        self._write_timer: Optional[CALLBACK_TYPE] = None
+        self._expire_timer: Optional[CALLBACK_TYPE] = None
 
         self._attr_unique_id = f"{vdev_id}-{sensor_type}"
         self._attr_name = name
@@ -104,65 +142,210 @@ class NarodmonSensor(CoordinatorEntity, SensorEntity):
 
     def _update_state(self):
         """Update entity state."""
-        fresh = int(time.time() - FRESHNESS_TIME)
-        for sensor in self.coordinator.data:
-            if sensor["type"] == self._sensor_type_id and sensor["time"] >= fresh:
-                if self._attr_native_value == sensor["value"]:
-                    return
+        sensor = (self.coordinator.data or {}).get(self._sensor_type_id)
+        if sensor is None:
+            return
 
-                device = sensor["device"]
+        self._restored_until = None
+        if self._attr_native_value == sensor.value:
+            return
 
-                self._attr_native_value = sensor["value"]
+        device = sensor.device
 
-                if self._sensor_id != int(sensor["id"]):
-                    self._sensor_id = int(sensor["id"])
-                    self._attr_extra_state_attributes = {
-                        ATTR_ATTRIBUTION: ATTRIBUTION,
-                    }
+        self._attr_native_value = sensor.value
 
-                self._attr_extra_state_attributes[ATTR_SENSOR_ID] = "S" + str(
-                    self._sensor_id
-                )
-                self._attr_extra_state_attributes[ATTR_SENSOR_NAME] = sensor["name"]
-                self._attr_extra_state_attributes[ATTR_DEVICE_ID] = "D" + str(
-                    device["id"]
-                )
-                self._attr_extra_state_attributes[ATTR_DEVICE_NAME] = device["name"]
-                self._attr_extra_state_attributes[ATTR_DISTANCE] = device["distance"]
-                if "location" in device:
-                    self._attr_extra_state_attributes[ATTR_LOCATION] = device[
-                        "location"
-                    ]
-                if "lat" in device and "lon" in device:
-                    self._attr_extra_state_attributes[ATTR_LATITUDE] = device["lat"]
-                    self._attr_extra_state_attributes[ATTR_LONGITUDE] = device["lon"]
-
-                _LOGGER.debug(
-                    "Set sensor '%s' state to %s %s",
-                    self._attr_name,
-                    self._attr_native_value,
-                    self._attr_native_unit_of_measurement,
-                )
-                return
+        if self._sensor_id != sensor.id:
+            self._sensor_id = sensor.id
+            self._attr_extra_state_attributes = {
+                ATTR_ATTRIBUTION: ATTRIBUTION,
+            }
+
+        self._attr_extra_state_attributes[ATTR_SENSOR_ID] = "S" + str(self._sensor_id)
+        self._attr_extra_state_attributes[ATTR_SENSOR_NAME] = sensor.name
+        self._attr_extra_state_attributes[ATTR_DEVICE_ID] = "D" + str(device.id)
+        self._attr_extra_state_attributes[ATTR_DEVICE_NAME] = device.name
+        self._attr_extra_state_attributes[ATTR_DISTANCE] = device.distance
+        if device.location is not None:
+            self._attr_extra_state_attributes[ATTR_LOCATION] = device.location
+        if device.lat is not None and device.lon is not None:
+            self._attr_extra_state_attributes[ATTR_LATITUDE] = device.lat
+            self._attr_extra_state_attributes[ATTR_LONGITUDE] = device.lon
+
+        _LOGGER.debug(
+            "Set sensor '%s' state to %s %s",
+            self._attr_name,
+            self._attr_native_value,
+            self._attr_native_unit_of_measurement,
+        )
+
+    async def _async_restore_state(self) -> None:
+        """Restore last known state if it is not older than restore time."""
+        last_state = await self.async_get_last_state()
+        last_data = await self.async_get_last_sensor_data()
+        if (
+            last_state is None
+            or last_state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN)
+            or last_data is None
+            or last_data.native_value is None
+        ):
+            return
+
+        restored_until = last_state.last_updated + self._restore_time
+        if restored_until <= dt_util.utcnow():
+            return
+
+        self._restored_until = restored_until
+        self._attr_native_value = last_data.native_value
+        self._attr_extra_state_attributes = {
+            k: v for k, v in last_state.attributes.items() if k in RESTORED_ATTRIBUTES
+        }
+        sensor_id = last_state.attributes.get(ATTR_SENSOR_ID)
+        if isinstance(sensor_id, str) and sensor_id[1:].isdigit():
+            self._sensor_id = int(sensor_id[1:])
+
+        _LOGGER.debug(
+            "Restore sensor '%s' state to %s %s",
+            self._attr_name,
+            self._attr_native_value,
+            self._attr_native_unit_of_measurement,
+        )
+
+    async def async_added_to_hass(self) -> None:
+        """When entity is added to hass."""
+        if self._sensor_type_id not in (self.coordinator.data or {}):
+            await self._async_restore_state()
+        self._update_state()
+        await super().async_added_to_hass()
+        self.async_on_remove(self._async_cancel_timers)
+
+    def _is_significant(self) -> bool:
+        """Return True if state differs from written one more than deadband."""
+        value, written = self._attr_native_value, self._written_value
+        try:
+            delta = abs(float(value) - float(written))
+        except (TypeError, ValueError):
+            return value != written
+
+        absolute, relative = self._deadband
+        return delta > 0 and delta >= max(absolute, relative * abs(float(written)))
+
+    def _should_write_state(self) -> bool:
+        """Return True if state is worth to be written to state machine."""
+        if self._written_at is None or self.available != self._written_available:
+            return True
+
+        elapsed = dt_util.utcnow() - self._written_at
+        if elapsed >= STATE_HEARTBEAT_INTERVAL:
+            return True
+        if elapsed < STATE_MIN_WRITE_INTERVAL:
+            return False
+
+        return self._sensor_id != self._written_sensor_id or self._is_significant()
+
+    @callback
+    def _async_cancel_write_timer(self) -> None:
+        """Cancel deferred state write."""
+        if self._write_timer is not None:
+            self._write_timer()
+            self._write_timer = None
+
+    @callback
+    def _async_cancel_timers(self) -> None:
+        """Cancel all scheduled state writes."""
+        self._async_cancel_write_timer()
+        if self._expire_timer is not None:
+            self._expire_timer()
+            self._expire_timer = None
+
+    @callback
+    def _async_schedule_expiry(self) -> None:
+        """Schedule state write for the moment current reading gets stale.
+
+        Coordinator keeps its last data while updates fail, so entity has to become
+        unavailable by itself.
+        """
+        if self._expire_timer is not None:
+            self._expire_timer()
+            self._expire_timer = None
+
+        sensor = (self.coordinator.data or {}).get(self._sensor_type_id)
+        if sensor is None or not self.available:
+            return
+
+        delay = sensor.time + FRESHNESS_TIME - self.coordinator.api.server_time()
+        self._expire_timer = async_call_later(
+            self.hass, max(delay, 0), self._async_handle_expire_timer
+        )
+
+    @callback
+    def _async_handle_expire_timer(self, _now: datetime) -> None:
+        """Write state when reading gets stale."""
+        self._expire_timer = None
+        self._async_write_state()
+
+    @callback
+    def _async_schedule_write(self) -> None:
+        """Schedule deferred write of state changes held back.
+
+        Significant changes are written as soon as minimal write interval is over,
+        insignificant ones are written on heartbeat.
+        """
+        self._async_cancel_write_timer()
+        if (
+            self._attr_native_value == self._written_value
+            and self._sensor_id == self._written_sensor_id
+        ):
+            return
+
+        significant = (
+            self._sensor_id != self._written_sensor_id or self._is_significant()
+        )
+        delay = STATE_MIN_WRITE_INTERVAL if significant else STATE_HEARTBEAT_INTERVAL
+        remaining = self._written_at + delay - dt_util.utcnow()
+        self._write_timer = async_call_later(
+            self.hass, max(remaining.total_seconds(), 0), self._async_handle_write_timer
+        )
+
+    @callback
+    def _async_handle_write_timer(self, _now: datetime) -> None:
+        """Write state held back by throttling."""
+        self._write_timer = None
+        self._async_write_state()
+
+    @callback
+    def _async_write_state(self) -> None:
+        """Write state to the state machine and remember written one."""
+        self._async_cancel_write_timer()
+        self._written_value = self._attr_native_value
+        self._written_sensor_id = self._sensor_id
+        self._written_available = self.available
+        self._written_at = dt_util.utcnow()
+        self.async_write_ha_state()
+        self._async_schedule_expiry()
 
     @callback
     def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._update_state()
-        super()._handle_coordinator_update()
+        """Handle updated data from the coordinator.
 
-    @property
-    def native_value(self) -> StateType:
-        """Return the value reported by the sensor."""
+        Insignificant changes are written only on heartbeat to save database writes.
+        Changes held back are written later by timer, even if no more data arrive.
+        """
         self._update_state()
-        return super().native_value
+        if self._should_write_state():
+            self._async_write_state()
+        else:
+            self._async_schedule_write()
 
     @property
     def available(self) -> bool:
         """Return True if entity is available."""
-        fresh = int(time.time() - FRESHNESS_TIME)
-        for sensor in self.coordinator.data:
-            if sensor["type"] == self._sensor_type_id and sensor["time"] >= fresh:
-                return True
+        sensor = (self.coordinator.data or {}).get(self._sensor_type_id)
+        if (
+            sensor is not None
+            and sensor.time >= self.coordinator.api.server_time() - FRESHNESS_TIME
+        ):
+            return True
 
-        return False
+        return (
+            self._restored_until is not None and self._restored_until > dt_util.utcnow()
+        )
@@ -0,0 +1,183 @@
+#  Copyright (c) 2021-2022, Andrey "Limych" Khrolenok <andrey@khrolenok.ru>
+#  Creative Commons BY-NC-SA 4.0 International Public License
+#  (see LICENSE.md or https://creativecommons.org/licenses/by-nc-sa/4.0/)
+"""The NarodMon Cloud Integration Component.
+
+For more details about this sensor, please refer to the documentation at
+https://github.com/Limych/ha-narodmon/
+"""
+from collections import deque
+import math
+from typing import Deque, Dict, Final, FrozenSet, Iterable, NamedTuple, Set, Tuple
+
+CELL_SIZE: Final = 0.25  # degrees
+COVERAGE_SIZE: Final = 32
+EARTH_RADIUS: Final = 6371.0  # km
+KM_PER_DEGREE: Final = math.pi * EARTH_RADIUS / 180
+
+
+def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Return great-circle distance between two points in km."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    hav = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(hav)))
+
+
+class Station(NamedTuple):
+    """Known Narodmon station."""
+
+    device_id: int
+    lat: float
+    lon: float
+    sensors: Dict[int, Tuple[int, int]]  # sensor ID -> (sensor type, reading time)
+    seen_ts: int
+
+
+class StationMatch(NamedTuple):
+    """Nearest known station sensor for a sensor type."""
+
+    sensor_id: int
+    device_id: int
+    distance: float
+
+
+class Coverage(NamedTuple):
+    """Area where all stations of given types are known."""
+
+    lat: float
+    lon: float
+    radius: float
+    types: FrozenSet[int]
+
+
+class StationIndex:
+    """Spatial index of known stations bucketed by grid cells.
+
+    Index also remembers areas covered by previous nearby searches. A station found
+    locally is reported only when the circle around the point with radius of
+    distance to that station lies within a covered area, so no unknown station of
+    the same type can be closer.
+    """
+
+    def __init__(self) -> None:
+        """Initialize index."""
+        self._stations: Dict[int, Station] = {}
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._coverage: Deque[Coverage] = deque(maxlen=COVERAGE_SIZE)
+
+    def __len__(self) -> int:
+        """Return number of indexed stations."""
+        return len(self._stations)
+
+    @staticmethod
+    def _cell(lat: float, lon: float) -> Tuple[int, int]:
+        """Return grid cell of point."""
+        return math.floor(lat / CELL_SIZE), math.floor(lon / CELL_SIZE)
+
+    def add(
+        self,
+        device_id: int,
+        lat: float,
+        lon: float,
+        sensors: Dict[int, Tuple[int, int]],
+    ) -> None:
+        """Add or update station.
+
+        Sensors are given as mapping of sensor ID to sensor type and reading time.
+        """
+        self.remove(device_id)
+        seen_ts = max((i[1] for i in sensors.values()), default=0)
+        self._stations[device_id] = Station(device_id, lat, lon, sensors, seen_ts)
+        self._cells.setdefault(self._cell(lat, lon), set()).add(device_id)
+
+    def remove(self, device_id: int) -> None:
+        """Remove station from index."""
+        station = self._stations.pop(device_id, None)
+        if station is None:
+            return
+
+        cell = self._cell(station.lat, station.lon)
+        self._cells[cell].discard(device_id)
+        if not self._cells[cell]:
+            self._cells.pop(cell)
+
+    def prune(self, expire_ts: float) -> None:
+        """Remove stations not seen since given time."""
+        for device_id in [
+            i for i, station in self._stations.items() if station.seen_ts < expire_ts
+        ]:
+            self.remove(device_id)
+
+    def add_coverage(
+        self, lat: float, lon: float, radius: float, types: Iterable[int]
+    ) -> None:
+        """Remember area where all stations of given types are known."""
+        self._coverage.append(Coverage(lat, lon, radius, frozenset(types)))
+
+    def _is_covered(self, lat: float, lon: float, radius: float, stype: int) -> bool:
+        """Return True if circle lies within an area covered for sensor type."""
+        return any(
+            stype in area.types
+            and distance(lat, lon, area.lat, area.lon) + radius <= area.radius
+            for area in self._coverage
+        )
+
+    def nearby(
+        self,
+        lat: float,
+        lon: float,
+        types: Iterable[int],
+        fresh_ts: float,
+        exclude: Iterable[int] = (),
+    ) -> Dict[int, StationMatch]:
+        """Return nearest known sensors of given types, indexed by sensor type.
+
+        Only sensors with readings since `fresh_ts` are considered, so a dead sensor
+        is skipped even when other sensors of its station are alive. Sensors from
+        `exclude` are skipped too.
+        """
+        exclude = set(exclude)
+        types = set(types)
+        areas = [area for area in self._coverage if area.types & types]
+        if not areas:
+            return {}
+
+        # No need to look further than the farthest edge of covered areas
+        max_radius = max(
+            area.radius - distance(lat, lon, area.lat, area.lon) for area in areas
+        )
+        if max_radius <= 0:
+            return {}
+
+        lat_span = math.ceil(max_radius / KM_PER_DEGREE / CELL_SIZE)
+        lon_scale = max(math.cos(math.radians(lat)), 0.01)
+        lon_span = math.ceil(max_radius / KM_PER_DEGREE / lon_scale / CELL_SIZE)
+        cell_lat, cell_lon = self._cell(lat, lon)
+
+        best: Dict[int, StationMatch] = {}
+        for i in range(cell_lat - lat_span, cell_lat + lat_span + 1):
+            for j in range(cell_lon - lon_span, cell_lon + lon_span + 1):
+                for device_id in self._cells.get((i, j), ()):
+                    station = self._stations[device_id]
+                    if station.seen_ts < fresh_ts:
+                        continue
+                    dist = distance(lat, lon, station.lat, station.lon)
+                    for sensor_id, (stype, reading_ts) in station.sensors.items():
+                        if (
+                            stype in types
+                            and reading_ts >= fresh_ts
+                            and sensor_id not in exclude
+                            and (stype not in best or dist < best[stype].distance)
+                        ):
+                            best[stype] = StationMatch(sensor_id, device_id, dist)
+
+        return {
+            stype: match
+            for stype, match in best.items()
+            if self._is_covered(lat, lon, match.distance, stype)
+        }
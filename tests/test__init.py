@@ -1,6 +1,8 @@
 """Tests for Narodmon Cloud Integration component."""
+from datetime import timedelta
 import logging
-from unittest.mock import AsyncMock, patch
+import time
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 from pytest_homeassistant_custom_component.common import MockConfigEntry
@@ -16,10 +18,14 @@ from custom_components.narodmon import (
     async_unload_entry,
     cv_apikey,
 )
-from custom_components.narodmon.api import NarodmonApiClient
+from custom_components.narodmon.api import (
+    DeviceInfo,
+    NarodmonApiClient,
+    SensorReading,
+)
 from homeassistant import config_entries
+from homeassistant.const import CONF_DEVICES
 from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.setup import async_setup_component
 
 from .const import MOCK_YAML_CONFIG
@@ -66,6 +72,17 @@ async def test_setup(hass: HomeAssistant, caplog):
         assert len(caplog.records) == 1
 
 
+async def test_setup_no_devices(hass: HomeAssistant):
+    """Test setup from configuration.yaml without devices."""
+    with patch.object(NarodmonApiClient, "async_init", new_callable=AsyncMock):
+        assert await async_setup_component(hass, DOMAIN, {DOMAIN: {CONF_DEVICES: []}})
+        await hass.async_block_till_done()
+        assert len(hass.states.async_all()) == 0
+
+        entries = hass.config_entries.async_entries(DOMAIN)
+        assert [i.state for i in entries] == [config_entries.ConfigEntryState.LOADED]
+
+
 async def test_setup_apikey(hass: HomeAssistant, caplog):
     """Test setup from configuration.yaml."""
     with patch.object(
@@ -104,6 +121,7 @@ async def test_setup_unload_and_reload_entry(hass: HomeAssistant, bypass_get_dat
     # them to be. Because we have patched the BlueprintDataUpdateCoordinator.async_get_data
     # call, no code from custom_components/integration_blueprint/api.py actually runs.
     assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
     assert (
         DOMAIN in hass.data
         and config_entry.entry_id in hass.data[DOMAIN]
@@ -114,6 +132,7 @@ async def test_setup_unload_and_reload_entry(hass: HomeAssistant, bypass_get_dat
 
     # Reload the entry and assert that the data from above is still there
     assert await async_reload_entry(hass, config_entry) is None
+    await hass.async_block_till_done()
     assert (
         DOMAIN in hass.data
         and config_entry.entry_id in hass.data[DOMAIN]
@@ -128,7 +147,7 @@ async def test_setup_unload_and_reload_entry(hass: HomeAssistant, bypass_get_dat
 
 
 async def test_setup_entry_exception(hass: HomeAssistant, error_on_get_data):
-    """Test ConfigEntryNotReady when API raises an exception during entry setup."""
+    """Test entry setup does not wait for API when it raises an exception."""
     # Create a mock entry so we don't have to go through config flow
     config_entry = MockConfigEntry(
         domain=DOMAIN, entry_id="test", source=config_entries.SOURCE_IMPORT
@@ -137,8 +156,200 @@ async def test_setup_entry_exception(hass: HomeAssistant, error_on_get_data):
     hass.data.setdefault(YAML_DOMAIN, {})
     hass.data[YAML_DOMAIN] = MOCK_YAML_CONFIG[DOMAIN]
 
-    # In this case we are testing the condition where async_setup_entry raises
-    # ConfigEntryNotReady using the `error_on_get_data` fixture which simulates
-    # an error.
-    with pytest.raises(ConfigEntryNotReady):
-        assert await async_setup_entry(hass, config_entry)
+    # In this case we are testing the condition where first refresh fails using
+    # the `error_on_get_data` fixture which simulates an error. Setup succeeds and
+    # coordinators keep retrying in background.
+    assert await async_setup_entry(hass, config_entry)
+    await hass.async_block_till_done()
+
+    coordinators = hass.data[DOMAIN][config_entry.entry_id]
+    assert len(coordinators) == len(MOCK_YAML_CONFIG[DOMAIN][CONF_DEVICES])
+    for coordinator in coordinators.values():
+        assert coordinator.last_update_success is False
+
+
+async def test_coordinator_snapshot(hass: HomeAssistant):
+    """Test coordinator publishes fresh readings indexed by sensor type."""
+    now_ts = int(time.time())
+    client = NarodmonApiClient(hass)
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, client, timedelta(minutes=3), 0, 0, ["humidity", "pressure"]
+    )
+    coordinator.sensors = {1, 2, 3}
+    coordinator._first_run = False  # pylint: disable=protected-access
+
+    device = DeviceInfo(1, "Test")
+    data = {
+        1: SensorReading(1, 2, 12.3, now_ts, "", device),
+        2: SensorReading(2, 2, 23.4, now_ts, "", device),
+        3: SensorReading(3, 3, 34.5, now_ts - 86400, "", device),
+        4: SensorReading(4, 3, 45.6, now_ts, "", device),
+    }
+    client.sensors = data
+    with patch.object(
+        NarodmonApiClient, "_async_fetch_data", new_callable=AsyncMock
+    ), patch.object(NarodmonApiClient, "async_set_nearby_listener") as listener:
+        # pylint: disable=protected-access
+        snapshot = await coordinator._async_update_data()
+
+        assert dict(snapshot) == {2: data[1]}
+        with pytest.raises(TypeError):
+            snapshot[3] = data[4]  # type: ignore[index]
+        listener.assert_called_once()
+
+
+async def test_coordinator_add_sensors(hass: HomeAssistant):
+    """Test coordinator replaces sensors of the same type with new ones."""
+    client = NarodmonApiClient(hass)
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, client, timedelta(minutes=3), 0, 0, ["humidity", "pressure"]
+    )
+    device1 = DeviceInfo(1, "Test")
+    device2 = DeviceInfo(2, "Test")
+    client.sensors = {
+        10: SensorReading(10, 2, 12.3, 0, "", device1),
+        11: SensorReading(11, 3, 23.4, 0, "", device1),
+        20: SensorReading(20, 2, 34.5, 0, "", device2),
+    }
+
+    # pylint: disable=protected-access
+    coordinator._add_sensors({10: 1, 11: 1})
+    assert coordinator.sensors == {10, 11}
+    assert coordinator.devices == {1}
+
+    coordinator._add_sensors({20: 2})
+    assert coordinator.sensors == {11, 20}
+    assert coordinator.devices == {1, 2}
+    assert client._device_refs[coordinator] == {1, 2}
+
+
+async def test_coordinator_dead_sensor(hass: HomeAssistant):
+    """Test sensor with expired reading is reported missing."""
+    now_ts = int(time.time())
+    client = NarodmonApiClient(hass)
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, client, timedelta(minutes=3), 0, 0, ["humidity"]
+    )
+    client.sensors = {10: SensorReading(10, 2, 12.3, 0, "", DeviceInfo(1, "Test"))}
+
+    # pylint: disable=protected-access
+    coordinator._add_sensors({10: 1})
+    client._evict(now_ts)
+    assert 10 in client.sensors
+    assert coordinator._missing_types({2}, now_ts) == {2}
+    assert coordinator._failing_sensors({2}) == {10}
+
+
+async def test_coordinator_same_cycle_discovery(hass: HomeAssistant):
+    """Test sensors found by discovery deliver readings within the same update."""
+    now_ts = int(time.time())
+    client = NarodmonApiClient(hass)
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, client, timedelta(minutes=3), 12.3, 45.6, ["humidity", "pressure"]
+    )
+
+    response = {
+        "devices": [
+            {
+                "id": 1,
+                "name": "Test",
+                "distance": 1.2,
+                "sensors": [
+                    {"id": 10, "type": 2, "value": 12.3, "time": now_ts},
+                    {"id": 11, "type": 3, "value": 23.4, "time": now_ts},
+                ],
+            }
+        ],
+    }
+    with patch(
+        "homeassistant.helpers.storage.Store.async_load",
+        new_callable=AsyncMock,
+        return_value=None,
+    ), patch("homeassistant.helpers.storage.Store.async_delay_save"), patch.object(
+        NarodmonApiClient, "async_init", new_callable=AsyncMock
+    ), patch.object(
+        NarodmonApiClient,
+        "_async_api_wrapper",
+        new_callable=AsyncMock,
+        return_value=response,
+    ) as wrapper:
+        # pylint: disable=protected-access
+        snapshot = await coordinator._async_update_data()
+
+        assert wrapper.call_count == 1
+        assert {k: v.value for k, v in snapshot.items()} == {2: 12.3, 3: 23.4}
+        assert coordinator.sensors == {10, 11}
+        assert coordinator.devices == {1}
+
+
+async def test_coordinator_dirty_set(hass: HomeAssistant):
+    """Test coordinator updates only listeners of changed sensor types."""
+    now_ts = int(time.time())
+    client = NarodmonApiClient(hass)
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, client, timedelta(minutes=3), 0, 0, ["humidity", "pressure"]
+    )
+    coordinator.sensors = {1, 2}
+    coordinator._first_run = False  # pylint: disable=protected-access
+
+    device = DeviceInfo(1, "Test")
+    client.sensors = {
+        1: SensorReading(1, 2, 12.3, now_ts, "", device),
+        2: SensorReading(2, 3, 23.4, now_ts, "", device),
+    }
+    humidity, pressure, other = Mock(), Mock(), Mock()
+    unsubs = [
+        coordinator.async_add_listener(humidity, 2),
+        coordinator.async_add_listener(pressure, 3),
+        coordinator.async_add_listener(other),
+    ]
+
+    with patch.object(NarodmonApiClient, "_async_fetch_data", new_callable=AsyncMock):
+        await coordinator.async_refresh()
+        assert (humidity.call_count, pressure.call_count, other.call_count) == (1, 1, 1)
+
+        # Unchanged readings
+        await coordinator.async_refresh()
+        assert (humidity.call_count, pressure.call_count, other.call_count) == (1, 1, 2)
+
+        # New reading of one sensor
+        client.sensors[2] = SensorReading(2, 3, 23.5, now_ts + 1, "", device)
+        await coordinator.async_refresh()
+        assert (humidity.call_count, pressure.call_count, other.call_count) == (1, 2, 3)
+
+        # Failure and recovery
+        with patch.object(
+            NarodmonApiClient, "async_update_data", side_effect=Exception
+        ):
+            await coordinator.async_refresh()
+        assert (humidity.call_count, pressure.call_count, other.call_count) == (2, 3, 4)
+        await coordinator.async_refresh()
+        assert (humidity.call_count, pressure.call_count, other.call_count) == (3, 4, 5)
+
+    for unsub in unsubs:
+        unsub()
+
+
+async def test_coordinator_phase(hass: HomeAssistant):
+    """Test coordinator updates are shifted to the polling phase of instance."""
+    interval = timedelta(minutes=3)
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, NarodmonApiClient(hass), interval, 0, 0, ["humidity"]
+    )
+    now_ts = 999_999_920.0  # 20 s past the interval grid
+
+    with patch(
+        "homeassistant.helpers.instance_id.async_get",
+        return_value="40000000-0000-0000-0000-000000000000",
+    ), patch("time.time", side_effect=lambda: now_ts), patch(
+        "random.uniform", return_value=0
+    ) as jitter:
+        # pylint: disable=protected-access
+        await coordinator._async_schedule_phase()
+        assert coordinator._phase == 45  # A quarter of interval
+        assert coordinator.update_interval == timedelta(seconds=25 + 180)
+        jitter.assert_called_once_with(-10, 10)
+
+        now_ts += 100
+        await coordinator._async_schedule_phase()
+        assert coordinator.update_interval == timedelta(seconds=105)
@@ -1,22 +1,58 @@
 """Tests for Narodmon API."""
 import asyncio
+from datetime import timedelta
+from email.utils import formatdate
+import json
+import logging
 import os
 import time
 from unittest.mock import AsyncMock, patch
 
 import aiohttp
-from pytest import raises
+from pytest import approx, raises
 from pytest_homeassistant_custom_component.common import load_fixture
 import yaml
 
+from custom_components.narodmon import api as api_module
 from custom_components.narodmon.api import (
+    ACCEPT_ENCODING,
+    BUDGET_CAPACITY,
+    CACHE_TTL,
+    CADENCE_SMOOTHING,
+    CLOCK_SMOOTHING,
+    CLOCK_TOLERANCE,
+    CONNECT_TIMEOUT,
+    CONNECTIONS_LIMIT,
     DATA_LAST_INIT_TS,
+    DATA_LIMIT,
+    DATA_NEARBY,
+    DATA_UNAVAILABLE,
     ENDPOINT_URL,
+    ERRNO_COOLDOWNS,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
     NARODMON_IDS,
+    NEARBY_CACHE_TTL,
+    NEARBY_CANDIDATES,
+    POLL_GRACE_TIME,
+    POLL_INTERVAL_MAX,
+    UNAVAILABLE_TTL_MAX,
+    UNAVAILABLE_TTL_MIN,
+    UPDATE_MIN_INTERVAL,
     ApiError,
+    CacheInfo,
+    DeviceInfo,
     NarodmonApiClient,
+    NearbyRequest,
+    SensorReading,
 )
-from custom_components.narodmon.const import DEFAULT_TIMEOUT, DEFAULT_VERIFY_SSL
+from custom_components.narodmon.budget import BudgetClosedError, RequestBudget
+from custom_components.narodmon.const import (
+    DEFAULT_TIMEOUT,
+    DEFAULT_VERIFY_SSL,
+    FRESHNESS_TIME,
+)
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
 from homeassistant.core import HomeAssistant
 
 ROOT = os.path.dirname(os.path.abspath(f"{__file__}/.."))
@@ -89,7 +125,8 @@ async def test_devices(hass: HomeAssistant):
     api._limit = 2
     assert api._devices4update == {1, 2}
 
-    api._devices = {1: 3, 2: 2, 3: 1}
+    for device_id, updated_ts in {1: 3, 2: 2, 3: 1}.items():
+        api._devices.push(device_id, updated_ts)
     assert api.devices == {1, 2, 3}
     #
     api._limit = 1
@@ -99,6 +136,88 @@ async def test_devices(hass: HomeAssistant):
     assert api._devices4update == {2, 3}
 
 
+# pylint: disable=protected-access
+async def test_update_cadence(hass: HomeAssistant):
+    """Test learning of devices publish cadence."""
+
+    # To test the api submodule, we first create an instance of our API client
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+    api.devices = {1, 2}
+    api._limit = 2
+    assert api._devices4update == {1, 2}
+
+    now_ts = int(time.time())
+
+    def device(device_id: int, publish_ts: int):
+        return {"id": device_id, "sensors": [{"time": publish_ts}]}
+
+    # First update: cadence is unknown yet
+    api._update_cadence(device(1, now_ts - 10), now_ts)
+    assert api._devices.next_update(1) == now_ts - 10 + 60 + POLL_GRACE_TIME
+    assert api._devices4update == {2}
+
+    # New data published: cadence is learned
+    api._update_cadence(device(1, now_ts + 290), now_ts + 300)
+    assert api._cadence[1] == 300
+    assert api._devices.next_update(1) == now_ts + 290 + 300 + POLL_GRACE_TIME
+    api._update_cadence(device(1, now_ts + 490), now_ts + 500)
+    assert api._cadence[1] == 300 + CADENCE_SMOOTHING * (200 - 300)
+
+    # No new data: back off exponentially
+    api._update_cadence(device(1, now_ts + 490), now_ts + 900)
+    assert api._devices.next_update(1) == now_ts + 900 + 120
+    api._update_cadence(device(1, now_ts + 490), now_ts + 1020)
+    assert api._devices.next_update(1) == now_ts + 1020 + 240
+    for _ in range(10):
+        api._update_cadence(device(1, now_ts + 490), now_ts + 2000)
+    assert api._devices.next_update(1) == now_ts + 2000 + POLL_INTERVAL_MAX.total_seconds()
+
+    # Forget stats of removed devices
+    api.devices = {2}
+    assert 1 not in api._devices and api._cadence == {}
+
+
+# pylint: disable=protected-access
+async def test_cache_eviction(hass: HomeAssistant):
+    """Test eviction of expired readings and unused devices."""
+
+    # To test the api submodule, we first create an instance of our API client
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+    now_ts = int(time.time())
+    expired_ts = now_ts - CACHE_TTL.total_seconds() - 1
+
+    for device_id, publish_ts in {1: now_ts, 2: expired_ts, 3: expired_ts}.items():
+        device = {
+            "id": device_id,
+            "sensors": [{"id": device_id * 10, "type": 1, "time": publish_ts}],
+        }
+        api._devices.push(device_id, now_ts - device_id)
+        api._update_cadence(device, now_ts)
+        api.sensors.update(api._convert2dict(device))
+    api._devices.push(4)  # Not updated yet
+    api.set_device_references("owner", {3})
+
+    api._evict(now_ts)
+
+    # Expired readings of referenced devices are kept
+    assert api.devices == {1, 3, 4}
+    assert set(api.sensors) == {10, 30}
+    assert api.cache_info() == CacheInfo(3, 2, 1, 1)
+
+    # Least recently updated unused devices are evicted over the cache bound
+    with patch("custom_components.narodmon.api.CACHE_MAX_DEVICES", 1):
+        api._evict(now_ts)
+
+    assert api.devices == {3}
+    assert set(api.sensors) == {30}
+    assert api.cache_info() == CacheInfo(1, 1, 3, 2)
+
+    # Reading is evicted as soon as device is not referenced anymore
+    api.set_device_references("owner", set())
+    api._evict(now_ts)
+    assert api.sensors == {}
+
+
 # pylint: disable=protected-access
 async def test_async_set_nearby_listener(hass: HomeAssistant):
     """Test setting nearby listener."""
@@ -113,12 +232,69 @@ async def test_async_set_nearby_listener(hass: HomeAssistant):
         mock_listener, hass.config.latitude, hass.config.longitude, {1, 2, 3}
     )
 
-    assert api._nearby_latitude == hass.config.latitude
-    assert api._nearby_longitude == hass.config.longitude
-    assert api._nearby_sensor_types == {1, 2, 3}
+    def other_listener(data: NARODMON_IDS):
+        """Mock listener."""
+
+    request = api._nearby_requests[
+        api._location_key(hass.config.latitude, hass.config.longitude)
+    ]
+    assert request.latitude == hass.config.latitude
+    assert request.longitude == hass.config.longitude
+    assert request.sensor_types == {1, 2, 3}
+    assert request.listeners == [(mock_listener, {1, 2, 3})]
+
+    # Requests for the same location are merged
+    await api.async_set_nearby_listener(
+        other_listener, hass.config.latitude, hass.config.longitude, {3, 4}
+    )
+    await api.async_set_nearby_listener(
+        mock_listener, hass.config.latitude, hass.config.longitude, {1}
+    )
+    assert len(api._nearby_requests) == 1
+    assert request.sensor_types == {1, 2, 3, 4}
+    assert request.listeners == [(other_listener, {3, 4}), (mock_listener, {1})]
+
+    # Requests for close locations are merged too
+    await api.async_set_nearby_listener(
+        other_listener, hass.config.latitude + 0.001, hass.config.longitude, {5}
+    )
+    assert len(api._nearby_requests) == 1
+    assert request.sensor_types == {1, 2, 3, 4, 5}
+
+    await api.async_set_nearby_listener(mock_listener, 1.2, 3.4, {1})
+    assert len(api._nearby_requests) == 2
+
+
+# pylint: disable=protected-access
+async def test_nearby_request_in_flight(hass: HomeAssistant):
+    """Test listeners set during a nearby sensors search are not lost."""
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+    listener = AsyncMock()
+    other_listener = AsyncMock()
+
+    async def search(request: NearbyRequest):
+        """Set new listener while request is in progress."""
+        await api.async_set_nearby_listener(other_listener, 12.3, 45.6, {2})
+        request.sensor_types.clear()
 
-    # pylint: disable=comparison-with-callable
-    assert api._nearby_listener == mock_listener
+    await api.async_set_nearby_listener(listener, 12.3, 45.6, {1})
+    with patch.object(api, "_async_search_nearby_sensors", side_effect=search):
+        await api._async_process_nearby_requests(network=True)
+
+    request = api._nearby_requests[api._location_key(12.3, 45.6)]
+    assert request.sensor_types == {2}
+    assert request.listeners == [(other_listener, {2})]
+
+    # Unresolved sensor types are queued again after local search
+    await api.async_set_nearby_listener(listener, 12.3, 45.6, {1, 3})
+    with patch.object(
+        api, "_async_search_local_sensors", side_effect=lambda x: x.sensor_types.discard(1)
+    ):
+        await api._async_process_nearby_requests(network=False)
+
+    request = api._nearby_requests[api._location_key(12.3, 45.6)]
+    assert request.sensor_types == {2, 3}
+    assert request.listeners == [(other_listener, {2}), (listener, {3})]
 
 
 async def test_convert2dict(hass: HomeAssistant):
@@ -128,30 +304,35 @@ async def test_convert2dict(hass: HomeAssistant):
     api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
 
     dev = TEST_DEVICE1_RESULT.copy()
-    expected_device = {
-        "id": 123,
-        "some": "data",
-        "distance": 345,
-    }
+    expected_device = DeviceInfo(123, "", 345)
     expected = {
-        1: {
-            "id": "1",
-            "type": 2,
-            "device": expected_device,
-        },
-        2: {
-            "id": 2,
-            "type": 3,
-            "some": "another data",
-            "device": expected_device,
-        },
+        1: SensorReading(1, 2, None, 0, "", expected_device),
+        2: SensorReading(2, 3, None, 0, "", expected_device),
     }
 
-    assert api._convert2dict(TEST_DEVICE1_RESULT) == expected
+    res = api._convert2dict(TEST_DEVICE1_RESULT)
+    assert res == expected
+    assert res[1].device is res[2].device
     assert dev == TEST_DEVICE1_RESULT
 
+    device = json.loads(load_fixture("sensorsOnDevice.json"))
+    res = api._convert2dict(device)
+    assert res[14907] == SensorReading(
+        14907,
+        2,
+        device["sensors"][0]["value"],
+        device["sensors"][0]["time"],
+        device["sensors"][0]["name"],
+        DeviceInfo(
+            1603,
+            "ESP Witty",
+            2.07,
+            "Moscow, Novokuznetskaya Street, 6",
+        ),
+    )
+    assert not hasattr(res[14907], "__dict__")
+
 
-# pylint: disable=unexpected-keyword-arg
 async def test_async_update_data(hass: HomeAssistant):
     """Test data updater."""
 
@@ -163,7 +344,7 @@ async def test_async_update_data(hass: HomeAssistant):
     ) as nearby, patch.object(
         api, "_async_update_sensors", new_callable=AsyncMock
     ) as device:
-        await api.async_update_data(no_throttle=True)
+        await api.async_update_data(force=True)
         #
         init.assert_called_once()
         nearby.assert_not_called()
@@ -173,15 +354,15 @@ async def test_async_update_data(hass: HomeAssistant):
         nearby.reset_mock()
         device.reset_mock()
 
-        api._nearby_listener = 1
+        await api.async_set_nearby_listener(AsyncMock(), 1.2, 3.4, {1})
+        await api.async_set_nearby_listener(AsyncMock(), 5.6, 7.8, {1})
         #
-        await api.async_update_data(no_throttle=True)
+        await api.async_update_data(force=True)
         #
         init.assert_called_once()
-        nearby.assert_called_once()
+        assert nearby.call_count == 2
         device.assert_not_called()
-        #
-        api._nearby_listener = None
+        assert api._nearby_requests == {}
 
         init.reset_mock()
         nearby.reset_mock()
@@ -189,7 +370,7 @@ async def test_async_update_data(hass: HomeAssistant):
 
         api.devices = {123}
         #
-        await api.async_update_data(no_throttle=True)
+        await api.async_update_data(force=True)
         #
         init.assert_called_once()
         nearby.assert_not_called()
@@ -198,61 +379,121 @@ async def test_async_update_data(hass: HomeAssistant):
         api.devices = {}
 
 
-async def test_async_init(hass: HomeAssistant):
-    """Test API initialization."""
-    now_ts = int(time.time())
+# pylint: disable=protected-access
+async def test_async_update_data_batching(hass: HomeAssistant):
+    """Test all callers within one update cycle share a single request."""
 
     # To test the api submodule, we first create an instance of our API client
     api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+    api.sensors = {1: {"id": 1}, 2: {"id": 2}, 3: {"id": 3}}
+
+    with patch.object(api, "_async_fetch_data", new_callable=AsyncMock) as fetch:
+        res = await asyncio.gather(
+            api.async_update_data({1, 2}),
+            api.async_update_data({3, 4}),
+        )
+        assert res == [{1: {"id": 1}, 2: {"id": 2}}, {3: {"id": 3}}]
+        fetch.assert_called_once()
+
+        await api.async_update_data()
+        fetch.assert_called_once()
+
+        await api.async_update_data(force=True)
+        assert fetch.call_count == 2
+
+        api._update_ts -= UPDATE_MIN_INTERVAL.total_seconds()
+        await api.async_update_data()
+        assert fetch.call_count == 3
+
+        api._update_ts -= UPDATE_MIN_INTERVAL.total_seconds()
+        fetch.side_effect = ApiError("test")
+        with raises(ApiError):
+            await api.async_update_data()
+        assert fetch.call_count == 4
+
+        fetch.side_effect = None
+        await api.async_update_data()
+        assert fetch.call_count == 5
+
+    # Callers stop waiting for a stalled update, but the update goes on
+    release = asyncio.Event()
+    with patch.object(
+        api, "_async_fetch_data", side_effect=release.wait
+    ) as fetch, patch.object(
+        api_module, "UPDATE_WAIT_TIMEOUT", timedelta(seconds=0.01)
+    ):
+        with raises(asyncio.TimeoutError):
+            await api.async_update_data(force=True)
+        assert not api._update_task.done()
+
+        release.set()
+        await api.async_update_data()
+        fetch.assert_called_once()
+
+
+# pylint: disable=protected-access
+async def test_reserve_budget(hass: HomeAssistant):
+    """Test budget fits initialization and search at all locations."""
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
 
-    with patch(
-        "homeassistant.helpers.storage.Store.async_load",
-        new_callable=AsyncMock,
-        return_value={},
-    ) as store_loader, patch(
-        "homeassistant.helpers.storage.Store.async_save", new_callable=AsyncMock
-    ) as store_saver, patch.object(
-        api, "_async_api_wrapper", new_callable=AsyncMock
-    ) as wrapper:
-        await api.async_init()
-
-        store_loader.assert_called_once()
-        store_saver.assert_called_once()
-        wrapper.assert_called_once()
+    api.reserve_budget(0)
+    assert api._budget.capacity == BUDGET_CAPACITY
 
-    with patch(
-        "homeassistant.helpers.storage.Store.async_load",
-        new_callable=AsyncMock,
-        return_value={
-            DATA_LAST_INIT_TS: now_ts - 86400,
-        },
-    ) as store_loader, patch(
-        "homeassistant.helpers.storage.Store.async_save", new_callable=AsyncMock
-    ) as store_saver, patch.object(
-        api, "_async_api_wrapper", side_effect=AsyncMock()
-    ) as wrapper:
-        await api.async_init()
+    api.reserve_budget(3)
+    assert api._budget.capacity == 7
+    assert api._budget.try_acquire(7) is True
 
-        store_loader.assert_called_once()
-        store_saver.assert_called_once()
-        wrapper.assert_called_once()
 
-    with patch(
-        "homeassistant.helpers.storage.Store.async_load",
-        new_callable=AsyncMock,
-        return_value={
-            DATA_LAST_INIT_TS: now_ts,
-        },
-    ) as store_loader, patch(
-        "homeassistant.helpers.storage.Store.async_save", new_callable=AsyncMock
-    ) as store_saver, patch.object(
-        api, "_async_api_wrapper", new_callable=AsyncMock
-    ) as wrapper:
-        await api.async_init()
+# pylint: disable=protected-access
+async def test_async_close(hass: HomeAssistant):
+    """Test closing of client fails callers waiting for budget."""
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+    api._budget._tokens = 0
+
+    task = hass.async_create_task(api._budget.async_acquire(1))
+    await asyncio.sleep(0)
+    assert api._budget._timer is not None
+
+    await api.async_close()
+    with raises(BudgetClosedError):
+        await task
+    assert api._budget._timer is None
 
-        store_loader.assert_called_once()
-        store_saver.assert_not_called()
-        wrapper.assert_not_called()
+
+async def test_async_init(hass: HomeAssistant):
+    """Test API initialization."""
+    now_ts = int(time.time())
+
+    for stored, init_expected in [
+        (None, True),
+        ({DATA_LAST_INIT_TS: now_ts - 86400}, True),
+        ({DATA_LAST_INIT_TS: now_ts}, False),
+    ]:
+        # To test the api submodule, we first create an instance of our API client
+        api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+
+        with patch(
+            "homeassistant.helpers.storage.Store.async_load",
+            new_callable=AsyncMock,
+            return_value=stored,
+        ) as store_loader, patch(
+            "homeassistant.helpers.storage.Store.async_delay_save"
+        ) as store_saver, patch.object(
+            api, "_async_api_wrapper", new_callable=AsyncMock
+        ) as wrapper:
+            await api.async_init()
+
+            store_loader.assert_called_once()
+            assert store_saver.called == init_expected
+            assert wrapper.call_count == int(init_expected)
+            saves = store_saver.call_count
+
+            # Init state is kept in memory between calls
+            await api.async_init()
+
+            store_loader.assert_called_once()
+            assert store_saver.call_count == saves
+            assert wrapper.call_count == int(init_expected)
 
 
 # pylint: disable=protected-access
@@ -278,10 +519,10 @@ async def test_async_get_nearby_sensors(hass: HomeAssistant):
             ],
         },
     ):
-        api._nearby_sensor_types = {2}
-        api._nearby_listener = listener = AsyncMock()
+        listener = AsyncMock()
+        await api.async_set_nearby_listener(listener, 12.3, 45.6, {2})
 
-        await api._async_search_nearby_sensors()
+        await api._async_process_nearby_requests(network=True)
 
         assert api._sensors_last_updated is True
         assert api._limit == 2
@@ -289,6 +530,313 @@ async def test_async_get_nearby_sensors(hass: HomeAssistant):
         listener.assert_called_once()
 
 
+# pylint: disable=protected-access
+async def test_nearby_sensors_cache(hass: HomeAssistant):
+    """Test persisting of discovered nearby sensors."""
+    stored = {DATA_LAST_INIT_TS: 0}
+
+    with patch(
+        "homeassistant.helpers.storage.Store.async_load",
+        new_callable=AsyncMock,
+        side_effect=lambda: stored,
+    ), patch("homeassistant.helpers.storage.Store.async_delay_save") as store_saver:
+        # To test the api submodule, we first create an instance of our API client
+        api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+
+        assert await api.async_get_cached_nearby_sensors(12.3, 45.6, {2, 5}) == {}
+
+        with patch.object(
+            api,
+            "_async_api_wrapper",
+            new_callable=AsyncMock,
+            return_value={
+                "devices": [
+                    TEST_DEVICE1_RESULT,
+                    TEST_DEVICE2_RESULT,
+                ],
+            },
+        ):
+            await api.async_set_nearby_listener(AsyncMock(), 12.3, 45.6, {2, 5})
+            await api._async_process_nearby_requests(network=True)
+
+        store_saver.assert_called()
+        assert stored[DATA_LIMIT] == 2
+
+        # Warm restart
+        api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+
+        assert await api.async_get_cached_nearby_sensors(12.3, 45.6, {2}) == {1: 123}
+        assert api.devices == {123}
+        assert api._limit == 2
+        assert await api.async_get_cached_nearby_sensors(1.2, 3.4, {2}) == {}
+
+        for item in stored[DATA_NEARBY]["12.30000,45.60000"].values():
+            item["ts"] -= NEARBY_CACHE_TTL.total_seconds() + 1
+        assert await api.async_get_cached_nearby_sensors(12.3, 45.6, {2, 5}) == {}
+
+
+# pylint: disable=protected-access
+async def test_failover_candidates(hass: HomeAssistant):
+    """Test failover to fallback candidates of stale sensors."""
+    stored = {DATA_LAST_INIT_TS: 0}
+    now_ts = int(time.time())
+
+    response = {
+        "devices": [
+            {
+                "id": i,
+                "distance": float(i),
+                "sensors": [{"id": i * 10, "type": 1, "time": now_ts}],
+            }
+            for i in range(1, NEARBY_CANDIDATES + 2)
+        ],
+    }
+
+    with patch(
+        "homeassistant.helpers.storage.Store.async_load",
+        new_callable=AsyncMock,
+        side_effect=lambda: stored,
+    ), patch("homeassistant.helpers.storage.Store.async_delay_save"), patch.object(
+        RequestBudget, "async_acquire", new_callable=AsyncMock
+    ):
+        # To test the api submodule, we first create an instance of our API client
+        api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+        await api._async_load_data()
+
+        with patch.object(
+            api, "_async_api_wrapper", new_callable=AsyncMock, return_value=response
+        ) as wrapper:
+            listener = AsyncMock()
+            await api.async_set_nearby_listener(listener, 12.3, 45.6, {1})
+            await api._async_process_nearby_requests(network=True)
+            listener.assert_called_once_with({10: 1})
+
+            cache = stored[DATA_NEARBY]["12.30000,45.60000"]
+            assert sorted(cache) == ["10", "20", "30"]
+            assert await api.async_get_cached_nearby_sensors(12.3, 45.6, {1}) == {
+                10: 1
+            }
+
+            # Primary sensor dies after discovery. It fails over to the next
+            # candidate without API request, and candidate device is polled at once
+            stale_ts = now_ts - FRESHNESS_TIME - 1
+            api.sensors[10].time = stale_ts
+            listener.reset_mock()
+            await api.async_set_nearby_listener(listener, 12.3, 45.6, {1})
+            await api._async_process_nearby_requests(network=False)
+            assert wrapper.call_count == 1
+            listener.assert_called_once_with({20: 2})
+            assert api._devices4update == {2}
+            assert api._nearby_requests == {}
+
+            # Failing sensor is excluded even when its reading is unknown
+            api.sensors.pop(10)
+            listener.reset_mock()
+            await api.async_set_nearby_listener(listener, 12.3, 45.6, {1}, {10})
+            await api._async_process_nearby_requests(network=False)
+            listener.assert_called_once_with({20: 2})
+
+            # Candidates with stale readings are skipped
+            api.sensors[20] = SensorReading(20, 1, 0, stale_ts, "", DeviceInfo(2, ""))
+            listener.reset_mock()
+            await api.async_set_nearby_listener(listener, 12.3, 45.6, {1}, {10})
+            await api._async_process_nearby_requests(network=False)
+            listener.assert_called_once_with({30: 3})
+
+            # Nearby sensors are searched again when no candidate is left
+            listener.reset_mock()
+            await api.async_set_nearby_listener(listener, 12.3, 45.6, {1}, {10, 30})
+            await api._async_process_nearby_requests(network=False)
+            listener.assert_not_called()
+            assert api._nearby_requests
+
+            # Search response tells which sensors are alive now
+            await api._async_process_nearby_requests(network=True)
+            assert wrapper.call_count == 2
+            listener.assert_called_once_with({20: 2})
+
+
+# pylint: disable=protected-access
+async def test_server_clock_offset(hass: HomeAssistant, aioclient_mock):
+    """Test estimation of server clock offset."""
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+    assert api.server_time() == approx(time.time(), abs=1)
+
+    # Offset is estimated by HTTP Date header
+    server_ts = int(time.time()) + 600
+    aioclient_mock.post(
+        ENDPOINT_URL,
+        text=load_fixture("sensorsOnDevice.json"),
+        headers={aiohttp.hdrs.DATE: formatdate(server_ts, usegmt=True)},
+    )
+    await api._async_api_wrapper({})
+    assert api.server_time() == approx(server_ts + 0.5, abs=2)
+
+    # Invalid header is ignored
+    api._observe_server_date("invalid", time.time())
+    api._observe_server_date(None, time.time())
+    assert api.server_time() == approx(server_ts + 0.5, abs=2)
+
+    # Readings far in the future are ignored
+    reading_ts = int(api.server_time()) + CLOCK_TOLERANCE + 60
+    api._observe_reading_times([{"sensors": [{"time": reading_ts}]}])
+    assert api.server_time() == approx(server_ts + 0.5, abs=2)
+
+    # Readings slightly in the future move server clock forward smoothly
+    reading_ts = int(api.server_time()) + 60
+    api._observe_reading_times([{"sensors": [{"time": reading_ts}]}])
+    assert api.server_time() == approx(reading_ts - 60 + 60 * CLOCK_SMOOTHING, abs=2)
+    reading_ts = int(api.server_time())
+
+    # Devices are scheduled by server clock
+    api._devices.push(1, reading_ts)
+    api._devices.schedule(1, reading_ts + 60)
+    assert api._devices4update == set()
+    api._devices.schedule(1, reading_ts - 60)
+    assert api._devices4update == {1}
+
+
+# pylint: disable=protected-access
+async def test_unavailable_types_cache(hass: HomeAssistant):
+    """Test skipping search for sensor types not available nearby."""
+    stored = {DATA_LAST_INIT_TS: 0}
+
+    with patch(
+        "homeassistant.helpers.storage.Store.async_load",
+        new_callable=AsyncMock,
+        side_effect=lambda: stored,
+    ), patch("homeassistant.helpers.storage.Store.async_delay_save"), patch.object(
+        RequestBudget, "async_acquire", new_callable=AsyncMock
+    ):
+        # To test the api submodule, we first create an instance of our API client
+        api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+        await api._async_load_data()
+
+        with patch.object(
+            api,
+            "_async_api_wrapper",
+            new_callable=AsyncMock,
+            return_value={"devices": [TEST_DEVICE1_RESULT]},
+        ) as wrapper:
+            await api.async_set_nearby_listener(AsyncMock(), 12.3, 45.6, {2, 7})
+            await api._async_process_nearby_requests(network=True)
+            assert wrapper.call_count == 1
+
+            cache = stored[DATA_UNAVAILABLE]["12.30000,45.60000"]
+            assert list(cache) == ["7"]
+            assert cache["7"]["misses"] == 1
+
+            # Unavailable type is not searched again until TTL expires
+            await api.async_set_nearby_listener(AsyncMock(), 12.3, 45.6, {7})
+            assert api._nearby_requests == {}
+            await api.async_set_nearby_listener(AsyncMock(), 1.2, 3.4, {7})
+            assert len(api._nearby_requests) == 1
+            api._nearby_requests.clear()
+
+            # Each next miss doubles TTL
+            cache["7"]["ts"] -= UNAVAILABLE_TTL_MIN.total_seconds() + 1
+            await api.async_set_nearby_listener(AsyncMock(), 12.3, 45.6, {7})
+            await api._async_process_nearby_requests(network=True)
+            assert wrapper.call_count == 2
+            assert cache["7"]["misses"] == 2
+            assert api._unavailable_ttl(2) == 2 * UNAVAILABLE_TTL_MIN.total_seconds()
+            assert api._unavailable_ttl(100) == UNAVAILABLE_TTL_MAX.total_seconds()
+
+            cache["7"]["ts"] -= UNAVAILABLE_TTL_MIN.total_seconds() + 1
+            await api.async_set_nearby_listener(AsyncMock(), 12.3, 45.6, {7})
+            assert api._nearby_requests == {}
+
+            # Found sensor type is removed from cache
+            cache["7"]["ts"] -= UNAVAILABLE_TTL_MIN.total_seconds()
+            wrapper.return_value = {
+                "devices": [
+                    {
+                        "id": 1,
+                        "distance": 1.0,
+                        "sensors": [{"id": 10, "type": 7, "time": 0}],
+                    }
+                ]
+            }
+            await api.async_set_nearby_listener(AsyncMock(), 12.3, 45.6, {7})
+            await api._async_process_nearby_requests(network=True)
+            assert "12.30000,45.60000" not in stored[DATA_UNAVAILABLE]
+
+
+# pylint: disable=protected-access
+async def test_async_search_local_sensors(hass: HomeAssistant):
+    """Test nearby sensors lookup among known stations."""
+    # To test the api submodule, we first create an instance of our API client
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+    now_ts = int(time.time())
+
+    response = {
+        "devices": [
+            {
+                "id": 1,
+                "distance": 1.11,
+                "lat": 55.76,
+                "lon": 37.62,
+                "sensors": [
+                    {"id": 10, "type": 1, "time": now_ts},
+                    {"id": 11, "type": 2, "time": now_ts},
+                ],
+            },
+            {
+                "id": 2,
+                "distance": 11.12,
+                "lat": 55.85,
+                "lon": 37.62,
+                "sensors": [{"id": 20, "type": 1, "time": now_ts}],
+            },
+        ],
+    }
+
+    with patch.object(
+        api, "_async_api_wrapper", new_callable=AsyncMock, return_value=response
+    ) as wrapper, patch.object(api, "async_init", new_callable=AsyncMock):
+        await api.async_set_nearby_listener(AsyncMock(), 55.75, 37.62, {1, 2})
+        await api.async_update_data(force=True)
+        assert wrapper.call_count == 1
+
+        # Other location in the covered area is resolved without API request
+        listener = AsyncMock()
+        await api.async_set_nearby_listener(listener, 55.77, 37.62, {1, 2})
+        await api._async_process_nearby_requests(network=False)
+        assert wrapper.call_count == 1
+        listener.assert_called_once_with({10: 1, 11: 1})
+        assert api._nearby_requests == {}
+
+        # Uncovered sensor types are left for a network search
+        listener = AsyncMock()
+        await api.async_set_nearby_listener(listener, 55.84, 37.62, {1, 3})
+        await api._async_process_nearby_requests(network=False)
+        listener.assert_called_once_with({20: 2})
+        request = api._nearby_requests["55.84000,37.62000"]
+        assert request.sensor_types == {3}
+
+        # Queued requests of several listeners are resolved in one round
+        api._nearby_requests.clear()
+        first, second = AsyncMock(), AsyncMock()
+        await api.async_set_nearby_listener(first, 55.76, 37.62, {1})
+        await api.async_set_nearby_listener(second, 55.76, 37.62, {2})
+        await api.async_set_nearby_listener(listener, 55.78, 37.62, {1})
+        await api._async_process_nearby_requests(network=False)
+        first.assert_called_once_with({10: 1})
+        second.assert_called_once_with({11: 1})
+        assert listener.call_count == 2
+        assert api._nearby_requests == {}
+
+        # Dead sensor is replaced even when other sensors of its station are alive
+        device = response["devices"][0]
+        device["sensors"][0]["time"] = now_ts - FRESHNESS_TIME - 1
+        api._index_station(device)
+        api.sensors.update(api._convert2dict(device))
+        listener = AsyncMock()
+        await api.async_set_nearby_listener(listener, 55.76, 37.62, {1, 2})
+        await api._async_process_nearby_requests(network=False)
+        listener.assert_called_once_with({20: 2, 11: 1})
+
+
 # pylint: disable=protected-access
 async def test_async_get_sensors_on_device(hass: HomeAssistant):
     """Test getting sensors on device."""
@@ -320,11 +868,148 @@ async def test_async_get_sensors_on_device(hass: HomeAssistant):
             assert api._devices[i] == now_ts
 
 
+# pylint: disable=protected-access
+async def test_async_api_request(hass: HomeAssistant):
+    """Test coalescing of in-flight API requests."""
+
+    # To test the api submodule, we first create an instance of our API client
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+
+    async def mock_wrapper(data):
+        await asyncio.sleep(0)
+        return {"request": data}
+
+    with patch.object(
+        api, "_async_api_wrapper", side_effect=mock_wrapper
+    ) as wrapper, patch.object(RequestBudget, "async_acquire") as acquire:
+        cmd = {"cmd": "sensorsOnDevice"}
+        res = await asyncio.gather(
+            api._async_api_request(cmd, devices={1, 2, 3}),
+            api._async_api_request(cmd, devices={3, 1}),
+            api._async_api_request(cmd, devices={1, 4}),
+            api._async_api_request({"cmd": "appInit"}),
+        )
+        assert wrapper.call_count == 3
+        assert res[0] is res[1]
+        assert res[0]["request"]["devices"] == "1,2,3"
+        assert res[2]["request"]["devices"] == "1,4"
+        assert api._inflight == []
+
+        await api._async_api_request(cmd, devices={1})
+        assert wrapper.call_count == 4
+        assert acquire.call_count == 4
+
+
 # In order to get 100% coverage, we also want to simulate raising the exceptions
 # to ensure that the function handles them as expected.
 # The caplog fixture allows access to log messages in tests. This is particularly
 # useful during exception handling testing since often the only action as part of
 # exception handling is a logging statement
+# pylint: disable=protected-access
+async def test_circuit_breaker(hass: HomeAssistant):
+    """Test requests are suspended while API is failing."""
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+
+    with patch.object(
+        api, "_async_api_wrapper", side_effect=ApiError("Blocked", errno=423)
+    ) as wrapper, patch.object(RequestBudget, "async_acquire", new_callable=AsyncMock):
+        with raises(ApiError):
+            await api._async_api_request({"cmd": "sensorsOnDevice"})
+        assert wrapper.call_count == 1
+
+        with raises(ApiError, match="suspended"):
+            await api._async_api_request({"cmd": "sensorsOnDevice"})
+        assert wrapper.call_count == 1
+        assert api._breaker.retry_after > ERRNO_COOLDOWNS[423] - 10
+
+
+# pylint: disable=protected-access
+async def test_hedged_request(hass: HomeAssistant):
+    """Test slow requests are hedged with a duplicate."""
+    api = NarodmonApiClient(
+        hass, verify_ssl=DEFAULT_VERIFY_SSL, timeout=DEFAULT_TIMEOUT, hedge_requests=True
+    )
+    release = asyncio.Event()
+    calls = []
+
+    async def wrapper(data):
+        calls.append(data)
+        if len(calls) == 1:
+            await release.wait()
+        return {"call": len(calls)}
+
+    with patch.object(api, "_async_api_wrapper", side_effect=wrapper), patch.object(
+        RequestBudget, "async_acquire", new_callable=AsyncMock
+    ), patch.object(api_module, "HEDGE_MIN_DELAY", 0.01):
+        # No hedging until latencies are known
+        calls.append(None)
+        assert await api._async_api_request({"cmd": "appInit"}) == {"call": 2}
+        assert api._latency.percentile("appInit", HEDGE_PERCENTILE) is None
+
+        for _ in range(HEDGE_MIN_SAMPLES):
+            api._latency.add("sensorsOnDevice", 0.01)
+
+        calls.clear()
+        result = await asyncio.wait_for(
+            api._async_api_request({"cmd": "sensorsOnDevice"}), 1
+        )
+        assert result == {"call": 2}
+        assert len(calls) == 2
+
+        # Latency of the cancelled slow request is tracked too
+        samples = api._latency._samples["sensorsOnDevice"]
+        assert len(samples) == HEDGE_MIN_SAMPLES + 2
+        assert samples[-1] >= 0.01
+
+        # Latency of failed request is tracked too
+        with patch.object(
+            api, "_async_api_wrapper", side_effect=ApiError("test")
+        ), raises(ApiError):
+            await api._async_api_request({"cmd": "sensorsNearby"})
+        assert len(api._latency._samples["sensorsNearby"]) == 1
+
+        # No hedging beyond budget
+        calls.clear()
+        with patch.object(RequestBudget, "try_acquire", return_value=False):
+            task = hass.async_create_task(
+                api._async_api_request({"cmd": "sensorsOnDevice"})
+            )
+            await asyncio.sleep(0.05)
+            assert len(calls) == 1
+
+            release.set()
+            assert await task == {"call": 1}
+
+
+# pylint: disable=protected-access
+async def test_dedicated_session(hass: HomeAssistant):
+    """Test client-owned HTTP session."""
+    api = NarodmonApiClient(hass, DEFAULT_VERIFY_SSL, DEFAULT_TIMEOUT)
+    await api.async_close()
+    assert api._session.closed is False
+
+    api = NarodmonApiClient(
+        hass, verify_ssl=False, timeout=DEFAULT_TIMEOUT, dedicated_session=True
+    )
+    session = api._session
+    assert session.headers[aiohttp.hdrs.ACCEPT_ENCODING] == ACCEPT_ENCODING
+    assert session.connector.limit == CONNECTIONS_LIMIT
+    assert api._timeout.connect == CONNECT_TIMEOUT
+    assert api._timeout.sock_read == DEFAULT_TIMEOUT
+
+    await api.async_close()
+    assert session.closed is True
+
+    # Session is closed with Home Assistant, as entries are not unloaded on stop
+    api = NarodmonApiClient(
+        hass, verify_ssl=False, timeout=DEFAULT_TIMEOUT, dedicated_session=True
+    )
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_CLOSE)
+    await hass.async_block_till_done()
+    assert api._session.closed is True
+    assert api._unsub_close is None
+
+
 # pylint: disable=protected-access
 async def test_async_api_wrapper(hass: HomeAssistant, aioclient_mock, caplog):
     """Test getting nearby sensors."""
@@ -355,6 +1040,26 @@ async def test_async_api_wrapper(hass: HomeAssistant, aioclient_mock, caplog):
         and "[400] Отсутствует ключ приложения: api_key" in caplog.record_tuples[2][2]
     )
 
+    caplog.clear()
+    aioclient_mock.clear_requests()
+    #
+    aioclient_mock.post(ENDPOINT_URL, text=load_fixture("sensorsOnDevice.json"))
+    with caplog.at_level(logging.INFO, logger="custom_components.narodmon"):
+        res = await api._async_api_wrapper({})
+    assert res == json.loads(load_fixture("sensorsOnDevice.json"))
+    assert not any("Response:" in i[2] for i in caplog.record_tuples)
+
+    caplog.clear()
+    aioclient_mock.clear_requests()
+    #
+    aioclient_mock.post(ENDPOINT_URL, text="{invalid json")
+    with raises(ValueError):
+        await api._async_api_wrapper({})
+    assert (
+        len(caplog.record_tuples) == 3
+        and "Error parsing information from" in caplog.record_tuples[2][2]
+    )
+
     caplog.clear()
     aioclient_mock.clear_requests()
     #
@@ -0,0 +1,61 @@
+"""Tests for Narodmon API circuit breaker."""
+from unittest.mock import patch
+
+from custom_components.narodmon.breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+)
+
+
+async def test_breaker():
+    """Test breaker states and backoff."""
+    now = 1000.0
+    breaker = CircuitBreaker(2, 10, 40)
+
+    with patch("time.monotonic", side_effect=lambda: now), patch(
+        "random.uniform", side_effect=lambda a, b: b
+    ):
+        breaker.record_failure()
+        assert breaker.state == STATE_CLOSED
+        assert breaker.allow() is True
+
+        breaker.record_failure()
+        assert breaker.state == STATE_OPEN
+        assert breaker.allow() is False
+        assert breaker.retry_after == 10
+
+        # Failures of requests sent earlier do not extend backoff
+        breaker.record_failure()
+        assert breaker.retry_after == 10
+
+        # Single probe request
+        now += 10
+        assert breaker.state == STATE_HALF_OPEN
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+
+        # Failed probe doubles backoff
+        breaker.record_failure()
+        assert breaker.retry_after == 20
+
+        # Cancelled probe lets another one through
+        now += 20
+        assert breaker.allow() is True
+        breaker.abort()
+        assert breaker.allow() is True
+
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.retry_after == 40  # Max delay
+
+        now += 40
+        assert breaker.allow() is True
+        breaker.record_success()
+        assert breaker.state == STATE_CLOSED
+
+        # Cool-down opens breaker at once
+        breaker.record_failure(cooldown=600)
+        assert breaker.state == STATE_OPEN
+        assert breaker.retry_after == 600
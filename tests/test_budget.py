@@ -0,0 +1,126 @@
+"""Tests for Narodmon request budget."""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+from pytest import raises
+
+from custom_components.narodmon.budget import (
+    ATTR_DAY,
+    ATTR_USED,
+    PRIORITY_DISCOVERY,
+    PRIORITY_INIT,
+    PRIORITY_UPDATE,
+    BudgetClosedError,
+    RequestBudget,
+)
+
+
+async def test_acquire_priorities():
+    """Test waiting callers are served by priority within budget."""
+    on_spend = MagicMock()
+    budget = RequestBudget(1, 0.01, 100, on_spend=on_spend)
+    served = []
+
+    async def caller(name: str, priority: int):
+        await budget.async_acquire(1, priority)
+        served.append(name)
+
+    await asyncio.gather(
+        caller("first", PRIORITY_DISCOVERY),
+        caller("discovery", PRIORITY_DISCOVERY),
+        caller("update", PRIORITY_UPDATE),
+        caller("init", PRIORITY_INIT),
+    )
+
+    assert served == ["first", "init", "update", "discovery"]
+    assert on_spend.call_count == 4
+    assert budget.used == 4
+
+
+async def test_acquire_cancel():
+    """Test cancelled caller does not block others."""
+    budget = RequestBudget(1, 0.05, 100)
+    await budget.async_acquire(1)
+
+    task = asyncio.create_task(budget.async_acquire(1))
+    await asyncio.sleep(0)
+    task.cancel()
+
+    await asyncio.wait_for(budget.async_acquire(1), 1)
+    assert budget.used == 2
+
+
+async def test_daily_quota():
+    """Test daily quota accounting."""
+    budget = RequestBudget(10, 0.01, 3)
+    today = budget.as_dict()[ATTR_DAY]
+
+    budget.restore({ATTR_DAY: "2000-01-01", ATTR_USED: 100})
+    assert budget.used == 0
+
+    budget.restore({ATTR_DAY: today, ATTR_USED: 2})
+    assert budget.used == 2
+
+    await budget.async_acquire(1)
+    assert budget.as_dict() == {ATTR_DAY: today, ATTR_USED: 3}
+
+    # Quota exhausted: wait for the next day
+    task = asyncio.create_task(budget.async_acquire(1))
+    await asyncio.sleep(0.05)
+    assert not task.done()
+
+    with patch.object(RequestBudget, "_today", return_value="2100-01-01"):
+        budget._process()  # pylint: disable=protected-access
+        await asyncio.wait_for(task, 1)
+        assert budget.used == 1
+
+
+async def test_try_acquire():
+    """Test non-blocking budget charge."""
+    budget = RequestBudget(2, 60, 3)
+
+    assert budget.try_acquire(1) is True
+    assert budget.try_acquire(2) is False
+    assert budget.try_acquire(1) is True
+    assert budget.try_acquire(1) is False
+    assert budget.used == 2
+
+    # Waiting callers go first
+    budget = RequestBudget(1, 60, 100)
+    await budget.async_acquire(1)
+    task = asyncio.create_task(budget.async_acquire(1))
+    await asyncio.sleep(0)
+    budget._tokens = 1  # pylint: disable=protected-access
+    assert budget.try_acquire(1) is False
+    task.cancel()
+
+
+async def test_close():
+    """Test closed budget fails waiting and new callers."""
+    budget = RequestBudget(1, 60, 100)
+    await budget.async_acquire(1)
+
+    task = asyncio.create_task(budget.async_acquire(1))
+    await asyncio.sleep(0)
+
+    budget.close()
+    with raises(BudgetClosedError):
+        await task
+    with raises(BudgetClosedError):
+        await budget.async_acquire(1)
+    assert budget._timer is None  # pylint: disable=protected-access
+
+
+async def test_resize():
+    """Test growth of capacity is available at once."""
+    budget = RequestBudget(3, 60, 100)
+    await budget.async_acquire(3)
+
+    budget.resize(7)
+    assert budget.capacity == 7
+    assert budget.try_acquire(4) is True
+    assert budget.try_acquire(1) is False
+
+    budget.resize(2)
+    assert budget.capacity == 2
+    assert budget.try_acquire(1) is False
@@ -0,0 +1,20 @@
+"""Tests for Narodmon request latency tracker."""
+from custom_components.narodmon.latency import LatencyTracker
+
+
+async def test_percentile():
+    """Test rolling latency percentiles."""
+    tracker = LatencyTracker(10, 3)
+
+    tracker.add("cmd", 1.0)
+    tracker.add("cmd", 2.0)
+    assert tracker.percentile("cmd", 0.5) is None
+    assert tracker.percentile("other", 0.5) is None
+
+    tracker.add("cmd", 3.0)
+    assert tracker.percentile("cmd", 0.5) == 2.0
+    assert tracker.percentile("cmd", 0.95) == 3.0
+
+    for _ in range(10):
+        tracker.add("cmd", 0.5)
+    assert tracker.percentile("cmd", 0.95) == 0.5
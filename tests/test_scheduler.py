@@ -0,0 +1,66 @@
+"""Tests for Narodmon devices update scheduler."""
+import random
+
+from custom_components.narodmon.scheduler import DeviceScheduler
+
+
+def test_scheduler():
+    """Test devices scheduling."""
+    scheduler = DeviceScheduler()
+    assert len(scheduler) == 0
+    assert scheduler.due(100, 10) == []
+
+    for device_id, updated_ts in {1: 30, 2: 20, 3: 10, 4: 40}.items():
+        scheduler.push(device_id, updated_ts)
+    assert len(scheduler) == 4
+    assert set(scheduler) == {1, 2, 3, 4}
+    assert 3 in scheduler and 5 not in scheduler
+    assert scheduler[3] == 10
+
+    # Least recently updated go first
+    assert scheduler.due(100, 2) == [3, 2]
+    assert scheduler.due(100, 0) == []
+
+    # Devices scheduled for the future are skipped
+    scheduler.schedule(3, 200)
+    scheduler.schedule(2, 50)
+    assert scheduler.next_update(2) == 50
+    assert scheduler.due(100, 10) == [1, 4, 2]
+    assert scheduler.due(10, 10) == [1, 4]
+
+    scheduler.push(1, 300)
+    assert scheduler.due(100, 10) == [4, 1, 2]
+
+    scheduler.remove(4)
+    assert 4 not in scheduler
+    assert scheduler.due(1000, 10) == [1, 2, 3]
+
+
+def test_scheduler_random():
+    """Test scheduler against plain sorting."""
+    rnd = random.Random(42)
+    scheduler = DeviceScheduler()
+    expected = {}
+
+    for _ in range(2000):
+        device_id = rnd.randrange(200)
+        action = rnd.random()
+        if action < 0.1 and device_id in expected:
+            scheduler.remove(device_id)
+            expected.pop(device_id)
+        elif action < 0.5 and device_id in expected:
+            next_ts = rnd.randrange(100)
+            scheduler.schedule(device_id, next_ts)
+            expected[device_id] = (next_ts, expected[device_id][1])
+        else:
+            updated_ts = rnd.randrange(100)
+            scheduler.push(device_id, updated_ts)
+            expected[device_id] = (expected.get(device_id, (0, 0))[0], updated_ts)
+
+        now_ts = rnd.randrange(100)
+        limit = rnd.randrange(1, 20)
+        due = [i for i in expected if expected[i][0] <= now_ts]
+        due.sort(key=lambda x: expected[x])
+        assert [expected[i] for i in scheduler.due(now_ts, limit)] == [
+            expected[i] for i in due[:limit]
+        ]
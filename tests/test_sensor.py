@@ -0,0 +1,186 @@
+"""Test Narodmon Cloud Integration sensors."""
+from datetime import timedelta
+import time
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import (
+    async_fire_time_changed,
+    mock_restore_cache_with_extra_data,
+)
+
+from custom_components.narodmon import NarodmonDataUpdateCoordinator
+from custom_components.narodmon.api import DeviceInfo, NarodmonApiClient, SensorReading
+from custom_components.narodmon.const import (
+    ATTR_SENSOR_ID,
+    DOMAIN,
+    FRESHNESS_TIME,
+    STATE_HEARTBEAT_INTERVAL,
+    STATE_MIN_WRITE_INTERVAL,
+)
+from custom_components.narodmon.sensor import NarodmonSensor
+from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
+from homeassistant.const import ATTR_ICON, STATE_UNAVAILABLE
+from homeassistant.core import HomeAssistant, State
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+
+from .const import MOCK_YAML_CONFIG
+
+
+async def test_restore_state(hass: HomeAssistant, bypass_get_data):
+    """Test sensors restore recent last known state until data arrive."""
+    stale = dt_util.utcnow() - timedelta(days=1)
+    mock_restore_cache_with_extra_data(
+        hass,
+        [
+            (
+                State(
+                    "sensor.test_humidity",
+                    "55.0",
+                    {ATTR_SENSOR_ID: "S10", ATTR_ICON: "mdi:test", "foo": "bar"},
+                ),
+                {"native_value": 55.0, "native_unit_of_measurement": "%"},
+            ),
+            (
+                State("sensor.test_pressure", "750", last_updated=stale),
+                {"native_value": 750, "native_unit_of_measurement": "mmHg"},
+            ),
+        ],
+    )
+
+    assert await async_setup_component(hass, DOMAIN, MOCK_YAML_CONFIG)
+    await hass.async_block_till_done()
+
+    state = hass.states.get("sensor.test_humidity")
+    assert state.state == "55.0"
+    assert state.attributes[ATTR_SENSOR_ID] == "S10"
+    assert state.attributes.get(ATTR_ICON) != "mdi:test"
+    assert "foo" not in state.attributes
+    entity = hass.data[SENSOR_DOMAIN].get_entity("sensor.test_humidity")
+    assert set(entity.extra_state_attributes) == {ATTR_SENSOR_ID}
+
+    state = hass.states.get("sensor.test_pressure")
+    assert state.state == STATE_UNAVAILABLE
+
+
+async def test_deadband(hass: HomeAssistant):
+    """Test insignificant changes are written only on heartbeat."""
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, NarodmonApiClient(hass), timedelta(minutes=3), 0, 0, ["temperature"]
+    )
+    sensor = NarodmonSensor(coordinator, "temperature", "test", "Test")
+    sensor.hass = hass
+    device = DeviceInfo(1, "Test")
+    now = dt_util.utcnow()
+
+    def update(value: float, sensor_id: int = 10, delay: timedelta = timedelta()):
+        """Feed new coordinator data to sensor."""
+        nonlocal now
+        now += delay
+        reading = SensorReading(sensor_id, 1, value, int(now.timestamp()), "", device)
+        coordinator.data = {1: reading}
+        with patch("homeassistant.util.dt.utcnow", return_value=now):
+            sensor._handle_coordinator_update()  # pylint: disable=protected-access
+
+    with patch.object(sensor, "async_write_ha_state") as writer:
+        update(20.0)
+        assert writer.call_count == 1
+
+        # Small change
+        update(20.1, delay=STATE_HEARTBEAT_INTERVAL / 2)
+        assert writer.call_count == 1
+        assert sensor.native_value == 20.1
+
+        # Significant change
+        update(21.0, delay=timedelta(seconds=1))
+        assert writer.call_count == 2
+
+        # Significant change, but too early
+        update(22.0, delay=timedelta(seconds=1))
+        assert writer.call_count == 2
+
+        # Other sensor
+        update(21.0, sensor_id=20, delay=STATE_MIN_WRITE_INTERVAL)
+        assert writer.call_count == 3
+
+        # Heartbeat
+        update(21.1, sensor_id=20, delay=STATE_HEARTBEAT_INTERVAL)
+        assert writer.call_count == 4
+
+        # Availability change
+        coordinator.data = {}
+        sensor._handle_coordinator_update()  # pylint: disable=protected-access
+        assert writer.call_count == 5
+
+    sensor._async_cancel_timers()  # pylint: disable=protected-access
+
+
+async def test_deferred_write(hass: HomeAssistant, freezer):
+    """Test changes held back by throttling are written later."""
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, NarodmonApiClient(hass), timedelta(minutes=3), 0, 0, ["temperature"]
+    )
+    sensor = NarodmonSensor(coordinator, "temperature", "test", "Test")
+    sensor.hass = hass
+    device = DeviceInfo(1, "Test")
+
+    def update(value: float):
+        """Feed new coordinator data to sensor."""
+        reading = SensorReading(10, 1, value, int(time.time()), "", device)
+        coordinator.data = {1: reading}
+        sensor._handle_coordinator_update()  # pylint: disable=protected-access
+
+    def tick(delay: timedelta):
+        """Move time forward and run due timers."""
+        freezer.tick(delay)
+        async_fire_time_changed(hass)
+
+    with patch.object(sensor, "async_write_ha_state") as writer, patch(
+        "custom_components.narodmon.sensor.FRESHNESS_TIME", 86400
+    ):
+        update(20.0)
+        assert writer.call_count == 1
+
+        # Significant change is written when minimal interval is over
+        tick(timedelta(seconds=1))
+        update(21.0)
+        assert writer.call_count == 1
+        tick(STATE_MIN_WRITE_INTERVAL)
+        assert writer.call_count == 2
+        assert sensor._written_value == 21.0  # pylint: disable=protected-access
+
+        # Insignificant change is written on heartbeat with no more updates
+        update(21.1)
+        tick(STATE_HEARTBEAT_INTERVAL / 2)
+        assert writer.call_count == 2
+        tick(STATE_HEARTBEAT_INTERVAL / 2)
+        assert writer.call_count == 3
+
+        # Nothing held back, so nothing is scheduled
+        assert sensor._write_timer is None  # pylint: disable=protected-access
+
+    sensor._async_cancel_timers()  # pylint: disable=protected-access
+
+
+async def test_stale_reading(hass: HomeAssistant, freezer):
+    """Test sensor gets unavailable when reading gets stale during API outage."""
+    coordinator = NarodmonDataUpdateCoordinator(
+        hass, NarodmonApiClient(hass), timedelta(minutes=3), 0, 0, ["temperature"]
+    )
+    sensor = NarodmonSensor(coordinator, "temperature", "test", "Test")
+    sensor.hass = hass
+    reading = SensorReading(10, 1, 20.0, int(time.time()), "", DeviceInfo(1, "Test"))
+    coordinator.data = {1: reading}
+
+    with patch.object(sensor, "async_write_ha_state") as writer:
+        sensor._handle_coordinator_update()  # pylint: disable=protected-access
+        assert writer.call_count == 1
+        assert sensor.available is True
+
+        # Updates fail, but coordinator keeps its last data
+        coordinator.last_update_success = False
+        freezer.tick(timedelta(seconds=FRESHNESS_TIME + 1))
+        async_fire_time_changed(hass)
+        assert writer.call_count == 2
+        assert sensor.available is False
+        assert sensor._expire_timer is None  # pylint: disable=protected-access
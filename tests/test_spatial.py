@@ -0,0 +1,51 @@
+"""Tests for Narodmon stations spatial index."""
+from pytest import approx
+
+from custom_components.narodmon.spatial import StationIndex, StationMatch, distance
+
+
+def test_distance():
+    """Test great-circle distance calculation."""
+    assert distance(55.75, 37.62, 55.75, 37.62) == 0
+    # Moscow - Saint Petersburg
+    assert distance(55.7558, 37.6173, 59.9343, 30.3351) == approx(634, abs=2)
+
+
+def test_station_index():
+    """Test nearby stations lookup."""
+    index = StationIndex()
+    index.add(1, 55.75, 37.62, {10: (1, 100), 11: (2, 100)})
+    index.add(2, 55.80, 37.62, {20: (1, 100), 21: (3, 100)})
+    index.add(3, 56.50, 37.62, {30: (4, 100)})
+    assert len(index) == 3
+
+    # Nothing is known until an area is covered by a nearby search
+    assert index.nearby(55.76, 37.62, {1, 2, 3}, 0) == {}
+
+    index.add_coverage(55.75, 37.62, 20, {1, 2, 3})
+    res = index.nearby(55.76, 37.62, {1, 2, 3, 4}, 0)
+    assert set(res) == {1, 2, 3}
+    assert res[1] == StationMatch(10, 1, approx(1.11, abs=0.01))
+    assert res[2].sensor_id == 11
+    assert res[3] == StationMatch(21, 2, approx(4.45, abs=0.01))
+
+    # Nearest station is too far to be sure nothing closer exists
+    assert 3 not in index.nearby(55.90, 37.62, {3}, 0)
+
+    # Stale stations are ignored
+    assert index.nearby(55.76, 37.62, {1}, 200) == {}
+
+    # Dead sensor is ignored even when its station is alive
+    index.add(1, 55.75, 37.62, {10: (1, 100), 11: (2, 300)})
+    assert index.nearby(55.76, 37.62, {1, 2}, 200) == {
+        2: StationMatch(11, 1, approx(1.11, abs=0.01))
+    }
+
+    # Excluded sensors are ignored
+    assert index.nearby(55.76, 37.62, {1}, 0, exclude={10})[1].sensor_id == 20
+
+    index.remove(1)
+    assert index.nearby(55.76, 37.62, {1}, 0)[1].sensor_id == 20
+
+    index.prune(200)
+    assert len(index) == 0